@@ -33,7 +33,7 @@ if "RANDELI_LOG" in os.environ:
 
 FONTMAP = os.path.join(
         click.get_app_dir("randeli", force_posix=True),
-        'fonts.json')
+        'fonts.db')
 
 BOOTSTRAP_KEYS = {
     'global.verbose' : {
@@ -19,6 +19,10 @@ BOOTSTRAP_KEYS={
     'augment.write-into' : {
         "type" : "str"
     },
+    'augment.save-mode' : {
+        "type" : "str",
+        "default" : "full"
+    },
     'ocr.dpi' : {
         "type" : "int",
         "default" : 72
@@ -44,56 +48,119 @@ BOOTSTRAP_KEYS={
     },
 }
 
+SAVE_MODES = ( "full", "incremental", "linearized", "compressed" )
 
-def augment_pdf(ctx):
 
-    from randeli.cmds.handlers.augment import PDFEventHandler
-    from randeli.librandeli.backend import Apryse as BACKEND
+def print_stats(ctx, eventH):
+    """End of run report"""
 
-    font_map = pathlib.Path( ctx.obj['policy.font-map-file'] )
+    if ctx.obj['stats'] is True:
+        click.echo(f"Decision cache: {eventH.policy.decision_cache}")
 
-    if not font_map.exists:
-        LOGGER.fatal(f"Could not open font-map file {str(font_map)}")
+        print_timings(ctx, eventH.backend)
+
+
+def print_timings(ctx, backend):
+
+    if ctx.obj['stats'] is True:
+        for name, seconds in backend.timings.items():
+            click.echo(f"{name:>12}: {seconds:.3f}s")
+
+
+def parse_pages_option(ctx, param, value):
+
+    # imported here as the backends need the apryse sdk
+    from randeli.librandeli.backend.base import parse_pages
+
+    try:
+        return parse_pages(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e)) from e
+
+
+def pdf_options(obj) -> dict:
+    """Apryse backend options for the augment config `obj`"""
 
     options = {
-        "apryse-token" : ctx.obj['apryse.token'],
-        "apryse-ocr" :  ctx.obj['ocr.enabled'],
-        "apryse-libdir" : ctx.obj['ocr.libdir'],
-        "keep-files" : ctx.obj['augment.keep-files'],
-        "write-into" : ctx.obj['augment.write-into'],
-        "dpi" : ctx.obj['ocr.dpi'],
+        "apryse-token" : obj['apryse.token'],
+        "apryse-ocr" :  obj['ocr.enabled'],
+        "apryse-libdir" : obj['ocr.libdir'],
+        "keep-files" : obj['augment.keep-files'],
+        "write-into" : obj['augment.write-into'],
+        "dpi" : obj['ocr.dpi'],
+        "pages" : obj['pages'],
+        "save-mode" : obj['augment.save-mode'],
     }
 
-    if ctx.obj['ocr.enabled'] is True and ctx.obj['ocr.engine'] == "apryse":
+    if obj['ocr.enabled'] is True and obj['ocr.engine'] == "apryse":
         options["apryse-ocr"] = True
 
-    if ctx.obj['ocr.mode'] == "page" or ctx.obj['ocr.forced'] is True:
+    if obj['ocr.mode'] == "page" or obj['ocr.forced'] is True:
 
         options["ocr-whole-page"] = True
     else:
         options["ocr-whole-page"] = False
 
-    try:
-        backend = BACKEND(options)
+    return options
 
-        eventH = PDFEventHandler(ctx=ctx.obj, backend=backend)
 
-        backend.notificationCenter().subscribe("BeginPage", eventH.beginPageCB)
-        backend.notificationCenter().subscribe("EndPage", eventH.endPageCB)
-        backend.notificationCenter().subscribe("ProcessElement", eventH.elementCB)
+def augment_pdf_document(obj, save_args):
+    """Augment the selected pages of obj['input'] and save it, returns
+    the event handler"""
 
-        backend.loadDocument(ctx.obj['input'])
+    from randeli.cmds.handlers.augment import PDFEventHandler
+    from randeli.librandeli.backend import Apryse as BACKEND
 
-        backend.processDocument( read_only=False )
+    backend = BACKEND( pdf_options(obj) )
+
+    eventH = PDFEventHandler(ctx=obj, backend=backend)
+
+    # pages without any of these are left as is
+    backend.options["augment-types"] = eventH.augmentTypes()
+
+    # and only these are posted to the handler
+    backend.options["element-types"] = eventH.elementTypes()
 
+    # the page's text is decided in one batch, read by the same pre-scan
+    backend.options["page-batch"] = "text" in backend.options["element-types"]
+
+    backend.notificationCenter().subscribe("OpenDocument", eventH.openDocumentCB)
+    backend.notificationCenter().subscribe("BeginPage", eventH.beginPageCB)
+    backend.notificationCenter().subscribe("EndPage", eventH.endPageCB)
+    backend.notificationCenter().subscribe("ProcessPage", eventH.processPageCB)
+    # each element is still posted, to be written
+    backend.notificationCenter().subscribe("ProcessElement", eventH.elementCB)
+
+    backend.loadDocument(obj['input'])
+
+    if eventH.overlayOnly():
+        LOGGER.debug("Only adding boxes, page content is left as is")
+
+    backend.processDocument( read_only=False, overlay=eventH.overlayOnly() )
+
+    backend.saveDocument( **save_args )
+    backend.finalise()
+
+    return eventH
+
+
+def augment_pdf(ctx):
+
+    font_map = pathlib.Path( ctx.obj['policy.font-map-file'] )
+
+    if not font_map.exists:
+        LOGGER.fatal(f"Could not open font-map file {str(font_map)}")
+
+    try:
         args = { }
         if ctx.obj['write']:
             args["filename" ] = ctx.obj['write']
         if ctx.obj['apryse.pdfa']:
             args["pdfa" ] = ctx.obj['apryse.pdfa']
 
-        backend.saveDocument( **args )
-        backend.finalise()
+        eventH = augment_pdf_document(ctx.obj, args)
+
+        print_stats(ctx, eventH)
 
     except Exception as ex:
         LOGGER.exception(str(ex),exc_info=ex)
@@ -106,6 +173,9 @@ def augment_epub(ctx):
 
     options = {
         "write-into" : ctx.obj['augment.write-into'],
+        "pages" : ctx.obj['pages'],
+        # paragraphs are posted a chapter at a time
+        "page-batch" : True,
     }
 
     try:
@@ -113,14 +183,20 @@ def augment_epub(ctx):
 
         eventH = EPUBEventHandler(ctx=ctx.obj, backend=backend)
 
+        # chapters without any of these are copied as is
+        backend.options["augment-types"] = eventH.augmentTypes()
+
         backend.notificationCenter().subscribe("BeginPage", eventH.beginPageCB)
         backend.notificationCenter().subscribe("EndPage", eventH.endPageCB)
+        backend.notificationCenter().subscribe("ProcessPage", eventH.processPageCB)
         backend.notificationCenter().subscribe("ProcessElement", eventH.elementCB)
 
         backend.loadDocument(ctx.obj['input'])
 
         backend.processDocument( read_only=False )
 
+        print_stats(ctx, eventH)
+
         args = { }
         if ctx.obj['write']:
             args["filename" ] = ctx.obj['write']
@@ -183,6 +259,12 @@ need to try a different DPI for the OCR mapping to page coordinates, i.e.
         type=int,
         help="Only analyse page PAGE",
         default=0)
+@click.option(
+    '--pages',
+        'pages',
+        metavar="RANGES",
+        callback=parse_pages_option,
+        help="Only augment pages RANGES, i.e. 3-7,12 (others are copied as is)")
 @click.option(
     '--ocr',
         'enable_ocr',
@@ -225,6 +307,13 @@ need to try a different DPI for the OCR mapping to page coordinates, i.e.
         default=BOOTSTRAP_KEYS['augment.keep-files']["default"],
         is_flag=True,
         help="Keep intermediate image files extracted by OCR")
+@click.option(
+    '--save-mode',
+        'save_mode',
+        metavar="MODE",
+        type=click.Choice(SAVE_MODES),
+        default=None,
+        help="Save the PDF in full, incremental (append changes), linearized (fast web view) or compressed MODE (default: augment.save-mode, or full)")
 @click.option(
     '--pdfa',
         'pdfa',
@@ -237,6 +326,12 @@ need to try a different DPI for the OCR mapping to page coordinates, i.e.
         default=False,
         is_flag=True,
         help="Force parsing input as EPUB")
+@click.option(
+    '--stats',
+        'stats',
+        default=False,
+        is_flag=True,
+        help="Print policy statistics at the end of the run")
 @click.option(
     '--hints',
         is_flag=True,
@@ -246,15 +341,21 @@ need to try a different DPI for the OCR mapping to page coordinates, i.e.
         help="Print additional help"
 )
 @click.pass_context
-def cli(ctx, read_, write_, write_dir_, page, enable_ocr, force_ocr, ocr_engine, ocr_mode, ocr_dpi, override, keep_files, pdfa, hints, is_epub ):
+def cli(ctx, read_, write_, write_dir_, page, pages, enable_ocr, force_ocr, ocr_engine, ocr_mode, ocr_dpi, override, keep_files, save_mode, pdfa, stats, hints, is_epub ):
     """Write an augmented PDF/EPUB"""
 
     ctx.obj['input'] = read_
-    ctx.obj['page'] = page
+    ctx.obj['pages'] = pages | { page } if page else pages
     ctx.obj['write'] = write_
     ctx.obj['augment.write-into'] = write_dir_
     ctx.obj['augment.keep-files'] = keep_files
 
+    # the config value is only replaced if --save-mode is given
+    if save_mode is not None:
+        ctx.obj['augment.save-mode'] = save_mode
+    else:
+        ctx.obj.setdefault('augment.save-mode', BOOTSTRAP_KEYS['augment.save-mode']["default"])
+
     ctx.obj['ocr.enabled'] = enable_ocr
     ctx.obj['ocr.forced'] = force_ocr
     ctx.obj['ocr.engine'] = ocr_engine
@@ -263,10 +364,15 @@ def cli(ctx, read_, write_, write_dir_, page, enable_ocr, force_ocr, ocr_engine,
 
     ctx.obj['apryse.pdfa'] = pdfa
 
+    ctx.obj['stats'] = stats
+
     for kv in override:
         s = kv.split("=")
         ctx.obj[s[0]] = s[1]
 
+    if ctx.obj['augment.save-mode'] not in SAVE_MODES:
+        raise click.UsageError(f"Unknown augment.save-mode '{ctx.obj['augment.save-mode']}', expected one of {', '.join(SAVE_MODES)}")
+
     inp = pathlib.Path(read_)
 
     if inp.suffix == ".epub" or is_epub is True:
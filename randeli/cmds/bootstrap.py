@@ -52,12 +52,21 @@ def cli(ctx, download, force):
         config["ocr"] = {}
         config["policy"] = {}
 
+        config.comments["augment"] = [
+            "# save-mode -> 'full' (default), 'incremental' (append changes), 'linearized' (fast web view) or 'compressed'",
+        ]
+
         config.comments["policy"] = [
             "# use_strong_text -> use a bold font to highlight the start of words (dynamic font)",
             "# use_colored_text -> use a color to highlight the start of words (using colored_text_color)",
             "# use_strong_box -> draw a box at start of words (using strong_box_color)",
             "# strong_box_shape -> default is 'box', but 'overbar' and 'underbar' are options",
             "#   set strong_box_height to a non-zero fixed height (i.e. ~4) for overbar/underbar",
+            "# split_mode -> 'random' (default) or 'hashed' (word splits do not depend on processing order)",
+            "# head_len_table -> optional LEN:MAX,... limits on head length by word length (i.e. 1:1,5:2,8:3)",
+            "# rules -> ordered 'augment if EXPR' / 'skip if EXPR' rules, the first match decides (see randeli/policy/pipeline.py)",
+            "#   quote any rule containing a comma",
+            "# lexicons -> optional word list files, listed words are never augmented (see randeli/policy/lexicon.py)",
         ]
 
         for k,t in CLI_KEYS.items():
@@ -20,77 +20,90 @@ class EPUBEventHandler:
         if ctx:
             self.policy.loadRulesFromDict( ctx )
 
-    def beginPageCB(self, msg : randeli.librandeli.notify.BeginPage):
+        self.compiled = self.policy.compile()
+
+        # every augmented span gets the same style
+        self.span_style = ""
+        if self.compiled.use_strong_text:
+            self.span_style += "font-weight:bold;"
+        if self.compiled.use_colored_text:
+            self.span_style += f"color:{self.compiled.text_color};"
 
-        status = ""
+    def augmentTypes(self):
+        """Tags a chapter must have for there to be anything to augment"""
 
-        if self.ctx['page'] != 0 and self.ctx['page'] != msg.page_number:
-            status = "(not selected for updating)"
+        return frozenset( ( "p", ) )
+
+    def beginPageCB(self, msg : randeli.librandeli.notify.BeginPage):
 
-        click.echo(f"Page {msg.page_number} / {msg.page_count} {status}")
+        # the backend only raises events for selected chapters
+        click.echo(f"Page {msg.page_number} / {msg.page_count}")
 
-        LOGGER.info(f"Page {msg.page_number} / {msg.page_count} {status}")
+        LOGGER.info(f"Page {msg.page_number} / {msg.page_count}")
 
     def endPageCB(self, msg : randeli.librandeli.notify.EndPage):
         pass
 
+    def processPageCB(self, msg : randeli.librandeli.notify.ProcessPage):
+
+        for ele_idx, para in zip(msg.ele_idx, msg.elements):
+            self.augmentParagraph(para, msg.builder, key=f"{msg.page}:{ele_idx}")
+
     def elementCB(self, msg : randeli.librandeli.notify.Element):
 
-        if self.ctx['page'] == 0 or self.ctx['page'] == msg.page_number:
+        self.augmentParagraph(msg.element, msg.builder, key=f"{msg.page}:{msg.ele_idx}")
 
-            augmented = msg.builder.new_tag("p")
+    def augmentParagraph(self, para, builder, key=None):
 
-            # just in case there are some attributes on the paragraph
-            for k,v in msg.element.attrs.items():
-                augmented[k] = v
+        augmented = builder.new_tag("p")
 
-            orig = copy.copy(msg.element.contents)
+        # just in case there are some attributes on the paragraph
+        for k,v in para.attrs.items():
+            augmented[k] = v
 
-            for child in orig:
+        orig = copy.copy(para.contents)
 
-                if isinstance(child, bs4.element.Tag):
+        for idx, child in enumerate(orig):
 
-                    augmented.append(child)
+            if isinstance(child, bs4.element.Tag):
 
-                else:
-                    self.process_text( child, augmented, builder=msg.builder )
+                augmented.append(child)
 
-            msg.element.replace_with(augmented)
+            else:
+                self.process_text( child, augmented, builder=builder,
+                                  key=f"{key}:{idx}" )
+
+        para.replace_with(augmented)
 
-    def process_text(self, child, output, builder=None):
+    def process_text(self, child, output, builder=None, key=None):
 
         words = child.split(' ')
 
-        for idx, word in enumerate(words):
+        decisions = self.policy.evaluate_many( words, key=key )
+
+        for idx, (word, augment, head_len) in enumerate(zip(words,
+                                                           decisions.augment.tolist(),
+                                                           decisions.head_len.tolist())):
 
             #if word == '' or word == ' ':
             if idx != 0:
                 output.append( " " )
 
-            if self.policy.shouldAugment( word ):
-                LOGGER.debug(f"policy will markup {word}")
+            if augment:
 
-                splits = self.policy.splitWord( word )
-
-                if self.policy.use_strong_text or self.policy.use_colored_text:
+                if self.span_style:
 
                     span = builder.new_tag("span")
 
                     # we're not using the class, but this would
                     # make it easy to de-randeli it later...
                     span["class"] = "randeli"
-                    span["style"] = ""
-
-                    if self.policy.use_strong_text:
-                        span["style"] += "font-weight:bold;"
-
-                    if self.policy.use_colored_text:
-                        span["style"] += f"color:{self.policy.getColoredTextColor()};"
+                    span["style"] = self.span_style
 
-                    span.string = splits.head
+                    span.string = word[:head_len]
                     output.append( span)
                     # no leading space
-                    output.append(splits.tail)
+                    output.append(word[head_len:])
 
                 else:
                     output.append( word )
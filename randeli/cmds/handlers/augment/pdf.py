@@ -11,76 +11,199 @@ class PDFEventHandler:
     def __init__(self, ctx=None, backend=None):
         self.overlay_boxes = []
 
+        # elementKey() -> decisions (splits of text, None if it is not
+        # augmented) for elements in Form XObjects, which are seen again
+        # (without a writer) wherever the form is placed
+        self.form_decisions = {}
+        self.form_ocr = {}
+
+        # ele_idx -> decisions for the text elements of the current page
+        # (outside forms), from the ProcessPage batch
+        self.page_decisions = {}
+
         self.ctx = ctx
         self.backend = backend
 
         self.policy = randeli.policy.Rules()
         self.policy.loadRulesFromDict( ctx )
 
-    def beginPageCB(self, msg : randeli.librandeli.notify.BeginPage):
+        # resolved once, read for every element
+        self.compiled = self.policy.compile()
 
-        status = ""
+        # replaced once the document's fonts are known
+        self.strong_fonts = self.compiled.strongFontTable()
 
-        self.overlay_boxes = []
+        self.compileStyles()
+
+    def compileStyles(self):
+        """Backend styles, compiled once per document"""
+
+        # (font path, font size) -> text style
+        self.text_styles = {}
+
+        self.box_style = self.backend.compileBoxStyle({
+            "x-scale": self.compiled.box_x_scale,
+            "x-offset": self.compiled.box_x_offset,
+            "y-scale": self.compiled.box_y_scale,
+            "y-offset": self.compiled.box_y_offset,
+            "box-color": self.compiled.strong_box_color,
+            "box-rgb": self.compiled.strong_box_rgb,
+            "box-height" : self.compiled.strong_box_height,
+            "box-shape" : self.compiled.strong_box_shape,
+        })
+
+    def overlayOnly(self) -> bool:
+        """True if the policy only adds boxes, so the page content
+        itself never needs to be re-written"""
+
+        return self.compiled.use_strong_box \
+            and not ( self.compiled.use_strong_text or self.compiled.use_colored_text )
+
+    def textStyle(self, font_path, font_size):
+
+        style = self.text_styles.get( (font_path, font_size) )
+
+        if style is None:
+            style = self.text_styles[ (font_path, font_size) ] = self.backend.compileTextStyle({
+                "font-path" : font_path,
+                "font-size": font_size,
+                "text-color": self.compiled.text_color,
+                "text-rgb": self.compiled.text_rgb,
+            })
+
+        return style
+
+    def openDocumentCB(self, msg : randeli.librandeli.notify.OpenDocument):
+
+        self.strong_fonts = self.compiled.strongFontTable(msg.fonts)
 
-        if self.ctx['page'] != 0 and self.ctx['page'] != msg.page_number:
-            status = "(not selected for updating)"
+        LOGGER.debug(f"Resolved strong fonts for {len(self.strong_fonts)} font variants")
 
-        click.echo(f"Page {msg.page_number} / {msg.page_count} {status}")
-        LOGGER.debug(f"Page {msg.page_number} / {msg.page_count} {status}")
+        self.compileStyles()
+
+    def elementTypes(self):
+        """Element types elementCB() does anything more with than write
+        them out, the backend writes the others through itself"""
+
+        if self.ctx['ocr.forced'] is True:
+            # augmented at the page level
+            return frozenset()
+
+        if self.ctx['ocr.enabled'] is True:
+            return frozenset( ( "text", "image" ) )
+
+        return frozenset( ( "text", ) )
+
+    def augmentTypes(self):
+        """Element types a page must have for there to be anything to
+        augment on it (None if every page is, i.e. forced OCR)"""
+
+        if self.ctx['ocr.forced'] is True:
+            return None
+
+        # text and images can also be inside forms
+        return self.elementTypes() | { "form" }
+
+    def beginPageCB(self, msg : randeli.librandeli.notify.BeginPage):
+
+        self.overlay_boxes = []
+        self.page_decisions = {}
+
+        # the backend only raises events for selected pages
+        click.echo(f"Page {msg.page_number} / {msg.page_count}")
+        LOGGER.debug(f"Page {msg.page_number} / {msg.page_count}")
 
         if self.ctx['ocr.forced'] is True:
 
             # Process entire page
-            if self.ctx['page'] == 0 or self.ctx['page'] == msg.page_number:
+            jsn = self.backend.extractTextFromImage(msg,
+                                                    out_filename=self.ctx['write'],
+                                                    out_dir=self.ctx['augment.write-into'])
+
+            paragraphs = json.loads(jsn)
 
+            opts = {
+                "box-color": self.compiled.strong_box_color,
+                "box-rgb": self.compiled.strong_box_rgb,
+                "box-height" : self.compiled.strong_box_height,
+                "box-shape" : self.compiled.strong_box_shape,
+                "dpi" : paragraphs['Page'][0]["dpi"],
+            }
 
-                jsn = self.backend.extractTextFromImage(msg,
-                                                        out_filename=self.ctx['write'],
-                                                        out_dir=self.ctx['augment.write-into'])
+            self.addOCRBoxes(paragraphs, opts, key=f"{msg.page_number}")
 
-                paragraphs = json.loads(jsn)
+    def processPageCB(self, msg : randeli.librandeli.notify.ProcessPage):
+        """Decide all the text on the page (outside forms) in one batch,
+        elementCB() then only looks the decisions up"""
 
-                opts = {
-                    "box-color": self.policy.strong_box_color,
-                    "box-height" : self.policy.strong_box_height,
-                    "box-shape" : self.policy.strong_box_shape,
-                    "dpi" : paragraphs['Page'][0]["dpi"],
-                }
+        # the keys elementCB() would split each word with on its own
+        decisions = self.policy.evaluate_many( msg.elements,
+                                              keys=[ f"{msg.page_number}:{ele_idx}" for ele_idx in msg.ele_idx ] )
 
-                for p in paragraphs['Page'][0]['Para']:
-                    for l in p['Line']:
-                        for word_obj in l['Word']:
+        for ele_idx, txt, augment, head_len in zip(msg.ele_idx, msg.elements,
+                                                   decisions.augment.tolist(),
+                                                   decisions.head_len.tolist()):
 
-                            if self.policy.shouldAugment(word_obj['text'],
-                                                         words_in_line=len(l['Word']),
-                                                         lines_in_para=len(p['Line'])):
+            self.page_decisions[ele_idx] = randeli.policy.rules.WordDetails(
+                head=txt[:head_len], tail=txt[head_len:]) if augment else None
 
-                                splits = self.policy.splitWord( word_obj['text'] )
+    def addOCRBoxes(self, paragraphs, opts, key=None, memoise=False):
+        """Evaluate every OCR'd word on the page in one batch and queue
+        a box for each augmented word (with `memoise`, the same decisions
+        every time for the same `key`)"""
 
-                                opts["box-width"] = float(len(splits.head) / len(word_obj['text']))
+        word_objs = []
+        words_in_line = []
+        lines_in_para = []
 
-                                box = self.backend.newBox( word_obj, style=opts)
+        for p in paragraphs['Page'][0]['Para']:
+            for l in p['Line']:
+                for word_obj in l['Word']:
+                    word_objs.append( word_obj )
+                    words_in_line.append( len(l['Word']) )
+                    lines_in_para.append( len(p['Line']) )
 
-                                self.overlay_boxes.append( box )
+        decisions = self.form_decisions.get(key) if memoise else None
 
+        if decisions is None:
+            decisions = self.policy.evaluate_many( [ w['text'] for w in word_objs ],
+                                                  words_in_line=words_in_line,
+                                                  lines_in_para=lines_in_para,
+                                                  key=key)
+            if memoise:
+                self.form_decisions[key] = decisions
 
+        # same scale/offsets for every word in the image
+        style = self.backend.compileBoxStyle(opts)
+
+        for word_obj, augment, head_len in zip(word_objs,
+                                               decisions.augment.tolist(),
+                                               decisions.head_len.tolist()):
+            if augment:
+
+                box = self.backend.newBox( word_obj, style=style, box_width=float(head_len / len(word_obj['text'])) )
+
+                self.overlay_boxes.append( box )
 
     def endPageCB(self, msg : randeli.librandeli.notify.EndPage):
 
-        for box in self.overlay_boxes:
-            LOGGER.debug(f"writing box @ {int(box['x'])},{int(box['y'])}")
-            LOGGER.debug(f"  {box}")
-            self.backend.drawBox( msg.writer, msg.builder, box)
+        LOGGER.debug(f"writing {len(self.overlay_boxes)} boxes")
 
-    def elementCB(self, msg : randeli.librandeli.notify.Element):
+        self.backend.drawBoxes( msg.writer, msg.builder, self.overlay_boxes, overlay_page=msg.overlay_page )
 
-        if self.ctx['page'] != 0 and self.ctx['page'] != msg.page_number:
-            #just write out the unmodified object
-            if msg.writer:
-                LOGGER.debug("Element on page not selected for modification")
-                self.backend.writeElement( msg.writer, msg.element )
-            return
+        # boxes belong to the page they were found on
+        self.overlay_boxes = []
+
+    def elementKey(self, msg : randeli.librandeli.notify.Element) -> str:
+        """Identifies the element for hashed head lengths, elements in a
+        Form XObject by the form rather than the page it is on"""
+
+        if msg.form:
+            return f"form{msg.form}:{msg.ele_idx}"
+
+        return f"{msg.page_number}:{msg.ele_idx}"
+
+    def elementCB(self, msg : randeli.librandeli.notify.Element):
 
         if self.ctx['ocr.forced'] is True:
             # just write out each element, augmentation is handled
@@ -99,26 +222,37 @@ class PDFEventHandler:
 
             LOGGER.debug(f"Processing '{td['text']}'")
 
-            if self.policy.shouldAugment( td['text'] ):
-                LOGGER.debug(f"policy will markup {td['text']}")
+            key = self.elementKey(msg)
 
-                splits = self.policy.splitWord( td['text'] )
+            if msg.form and key in self.form_decisions:
+                splits = self.form_decisions[key]
+            elif not msg.form and msg.ele_idx in self.page_decisions:
+                # decided with the rest of the page (processPageCB)
+                splits = self.page_decisions[msg.ele_idx]
+            else:
+                # text in a form (decided once, wherever the form is
+                # placed) or without a page batch, so decided directly
+                splits = None
+                if self.policy.shouldAugment(td['text']):
+                    splits = self.policy.splitWord(td['text'], key=key)
 
-                if self.policy.use_strong_text or self.policy.use_colored_text :
+                if msg.form:
+                    self.form_decisions[key] = splits
 
-                    opts={
-                        "font-path" : self.policy.getStrongFontPath(
-                            td['font-family'],
-                            italic=td['italic'],
-                            size=td['font-size']
-                        ),
-                        "font-size": self.policy.getStrongFontSize(td["font-size"]),
-                        "text-color": self.policy.getColoredTextColor(),
-                    }
+            if splits is not None:
+                LOGGER.debug(f"policy will markup {td['text']}")
+
+                # without a writer (overlay, or a form already rewritten)
+                # only the boxes are needed
+                if ( self.compiled.use_strong_text or self.compiled.use_colored_text ) and msg.writer:
+
+                    style = self.textStyle(
+                        self.strong_fonts.lookup(td['font-family'], td['italic']),
+                        self.compiled.strongFontSize(td["font-size"]) )
 
                     head_ele = self.backend.updateTextInElement(
                         msg.writer, msg.element, splits.head,
-                        style=opts)
+                        style=style)
 
                     self.backend.writeElement( msg.writer, head_ele )
 
@@ -139,24 +273,13 @@ class PDFEventHandler:
                     # write the original element, any other updates are as "overlay"
                     self.backend.writeElement( msg.writer, msg.element )
 
-                if self.policy.use_strong_box:
+                if self.compiled.use_strong_box:
                     # to avoid co-ordinate clashes mid page, we need to
                     # split the generation of box cordinates from
                     # creating the box - for that we wait until
                     # after all other elements on the page have been
                     # written
-                    opts = {
-                        "x-scale": self.policy.box_x_scale,
-                        "x-offset": self.policy.box_x_offset,
-                        "y-scale": self.policy.box_y_scale,
-                        "y-offset": self.policy.box_y_offset,
-                        "box-color": self.policy.getStrongBoxColor(),
-                        "box-height" : self.policy.strong_box_height,
-                        "box-shape" : self.policy.strong_box_shape,
-                        "box-width" : float(len(splits.head) / len(td['text'])) ,
-                    }
-
-                    box = self.backend.newBox( td, style=opts )
+                    box = self.backend.newBox( td, style=self.box_style, box_width=float(len(splits.head) / len(td['text'])) )
 
                     self.overlay_boxes.append(box)
 
@@ -172,46 +295,42 @@ class PDFEventHandler:
                 imgd = self.backend.getImageDetails(msg.element)
                 LOGGER.debug(f"Image {imgd}")
 
-                if imgd['width'] > self.policy.min_ocr_image_width and imgd['height'] > self.policy.min_ocr_image_height:
+                if imgd['width'] > self.compiled.min_ocr_image_width and imgd['height'] > self.compiled.min_ocr_image_height:
 
                     LOGGER.debug(f"Found image, processing using OCR ({self.ctx['ocr.mode']})")
 
-                    jsn = self.backend.extractTextFromImage(msg,
-                                                            out_filename=self.ctx['write'],
-                                                            out_dir=self.ctx['augment.write-into'])
-                    paragraphs = json.loads(jsn)
+                    key = self.elementKey(msg)
+
+                    # an image in a form is only OCR'd once
+                    paragraphs = self.form_ocr.get(key) if msg.form else None
+
+                    if paragraphs is None:
+                        jsn = self.backend.extractTextFromImage(msg,
+                                                                out_filename=self.ctx['write'],
+                                                                out_dir=self.ctx['augment.write-into'])
+                        paragraphs = json.loads(jsn)
+
+                        if msg.form:
+                            self.form_ocr[key] = paragraphs
 
                     opts = {
                         "x-scale": imgd['bbox']['width'] / imgd['width'],
-                        "x-offset": imgd['bbox']['x'] + self.policy.box_x_offset,
+                        "x-offset": imgd['bbox']['x'] + self.compiled.box_x_offset,
                         "y-scale": imgd['bbox']['height'] / imgd['height'],
-                        "y-offset": imgd['bbox']['y'] + self.policy.box_y_offset,
-                        "box-color": self.policy.strong_box_color,
-                        "box-height" : self.policy.strong_box_height,
-                        "box-shape" : self.policy.strong_box_shape,
+                        "y-offset": imgd['bbox']['y'] + self.compiled.box_y_offset,
+                        "box-color": self.compiled.strong_box_color,
+                        "box-rgb": self.compiled.strong_box_rgb,
+                        "box-height" : self.compiled.strong_box_height,
+                        "box-shape" : self.compiled.strong_box_shape,
                         "dpi" : paragraphs['Page'][0]["dpi"],
                     }
 
                     # TODO tidy up interface,
                     # this is exposing Apryse view of extracted text into application code.
-                    for p in paragraphs['Page'][0]['Para']:
-                        for l in p['Line']:
-                            for word_obj in l['Word']:
-
-                                if self.policy.shouldAugment(word_obj['text'],
-                                                             words_in_line=len(l['Word']),
-                                                             lines_in_para=len(p['Line'])):
-
-                                    splits = self.policy.splitWord( word_obj['text'] )
-
-                                    opts["box-width"] = float(len(splits.head) / len(word_obj['text']))
-
-                                    box = self.backend.newBox( word_obj, style=opts)
-
-                                    self.overlay_boxes.append( box )
+                    self.addOCRBoxes(paragraphs, opts, key=key, memoise=bool(msg.form))
 
                 else:
-                    LOGGER.warn(f"Image is smaller than configure minimum OCR size; {imgd['width']}x{imgd['height']} vs {self.policy.min_ocr_image_width}x{self.policy.min_ocr_image_height}")
+                    LOGGER.warn(f"Image is smaller than configure minimum OCR size; {imgd['width']}x{imgd['height']} vs {self.compiled.min_ocr_image_width}x{self.compiled.min_ocr_image_height}")
 
 
         else:
@@ -4,6 +4,7 @@ import click
 
 import randeli
 from randeli import LOGGER
+from randeli.cmds.augment import parse_pages_option
 
 KEYS={
     'apryse.token' : "str",
@@ -22,6 +23,7 @@ def inspect_epub(ctx):
             LOGGER.debug(f"text={child}")
 
     options = {
+        "pages" : ctx.obj['pages'],
     }
 
     try:
@@ -55,9 +57,6 @@ def inspect_pdf(ctx):
 
     def elementCB(msg:randeli.librandeli.notify.Element):
 
-        if ctx.obj['page'] != 0 and  ctx.obj['page'] != msg.page_number:
-            return
-
         bbox = msg.bbox
 
         LOGGER.success(f"Element {msg.ele_idx} {msg.ele_type_str} ({msg.ele_type}) ( {bbox['x1']},{bbox['y1']} {bbox['x2']},{bbox['y2']} )")
@@ -75,6 +74,7 @@ def inspect_pdf(ctx):
 
     options = {
         "apryse-token" : ctx.obj['apryse.token'],
+        "pages" : ctx.obj['pages'],
     }
 
     try:
@@ -121,6 +121,12 @@ Inspect the structure of a PDF/EPUB
         metavar="NUMBER",
         help="Only inspect page NUMBER",
         default=0)
+@click.option(
+    '--pages',
+        'pages',
+        metavar="RANGES",
+        callback=parse_pages_option,
+        help="Only inspect pages RANGES, i.e. 3-7,12")
 @click.option(
     '--override',
         'override',
@@ -142,10 +148,10 @@ Inspect the structure of a PDF/EPUB
         help="Print additional help",
         is_eager=True)
 @click.pass_context
-def cli(ctx, read_, fonts, page, override, is_epub):
+def cli(ctx, read_, fonts, page, pages, override, is_epub):
     """Read a PDF/EPUB and report on its structure"""
 
-    ctx.obj['page'] = page
+    ctx.obj['pages'] = pages | { page } if page else pages
     ctx.obj['fonts'] = fonts
     ctx.obj['input'] = read_
 
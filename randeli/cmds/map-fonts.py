@@ -3,10 +3,13 @@ import os
 import pathlib
 import platform
 import re
+from concurrent.futures import ProcessPoolExecutor
 
 import click
 
 from randeli import LOGGER
+from randeli.policy.fontindex import (FONT_SUFFIXES, FontIndex, is_font_index,
+                                      read_font_names, write_index)
 
 from .config import write_config_value_to_file
 
@@ -18,6 +21,9 @@ system_font_paths = {
 
 default_font_paths = system_font_paths[ platform.system() ]
 
+# bump if the layout of the scan cache changes
+SCAN_CACHE_FORMAT = 1
+
 
 def print_long_help_and_exit(ctx, param, value):
 
@@ -33,6 +39,17 @@ Build a font map from querying fonts in each FONTDIR
 Use --alias ALIAS:FONTNAME as a generic font mapper.
 
 i.e. --alias 'LMRoman:Latin Modern'
+
+FILE is written as a (SQLite) font index, unless it ends in .json
+when the original JSON font map is written instead.
+
+An existing font index is only rebuilt if fonts have been added to or
+removed from the FONTDIRs since it was written, if it was written with
+different --alias, --computer-modern or --fallback-font options (or
+with --force).
+
+The names read from each font file are kept in FILE.scan, so only new
+or changed font files are read again (all of them with --force).
 """)
         ctx.exit()
 
@@ -45,7 +62,7 @@ i.e. --alias 'LMRoman:Latin Modern'
         help="Save font mapping to FILE",
         default=os.path.join(
             click.get_app_dir("randeli", force_posix=True),
-            'fonts.json'))
+            'fonts.db'))
 @click.option(
     '--font-dir',
         'font_dir',
@@ -84,6 +101,18 @@ i.e. --alias 'LMRoman:Latin Modern'
         'echo',
         is_flag=True,
         help="Display font names/styles")
+@click.option(
+    '--jobs',
+        'jobs',
+        metavar="N",
+        type=int,
+        default=1,
+        help="Read font files using N processes (0: one per CPU)")
+@click.option(
+    '--force',
+        'force',
+        is_flag=True,
+        help="Rebuild the font map, re-reading every font file")
 @click.option(
     '--hints',
         is_flag=True,
@@ -92,10 +121,26 @@ i.e. --alias 'LMRoman:Latin Modern'
         expose_value=False,
         is_eager=True)
 @click.pass_context
-def cli(ctx, font_file, font_dir, fallback_font, cm_alias, update_config, alias, echo):
-    """Create fonts.map from installed fonts"""
+def cli(ctx, font_file, font_dir, fallback_font, cm_alias, update_config, alias, echo, jobs, force):
+    """Create a font index (fonts.db) from installed fonts"""
+
+    as_json = pathlib.Path(font_file).suffix.lower() == ".json"
+
+    # the options the index is built with, changing any rebuilds it
+    options = {
+        "alias" : list(alias),
+        "computer-modern" : cm_alias,
+        "fallback-font" : fallback_font,
+    }
+
+    if not as_json and not force and not echo and is_font_index(font_file) \
+            and not FontIndex(font_file).isStale(dirs=list(font_dir), options=options):
+
+        LOGGER.info(f"Font index {font_file} is up to date")
+        click.echo(f"Font index {font_file} is up to date (use --force to rebuild)")
 
-    from fontTools import ttLib
+        update_config_file(ctx, font_file, fallback_font, update_config, FontIndex(font_file))
+        return
 
     fonts = {}
 
@@ -104,6 +149,8 @@ def cli(ctx, font_file, font_dir, fallback_font, cm_alias, update_config, alias,
     for a in alias:
         aliases.append( a )
 
+    font_files = []
+
     for dir_ in font_dir:
 
         LOGGER.info(f"Mapping files under {dir_}")
@@ -113,43 +160,68 @@ def cli(ctx, font_file, font_dir, fallback_font, cm_alias, update_config, alias,
 
                 path_to_font = pathlib.PurePath(root, filename)
 
-                if path_to_font.suffix.lower() in [".ttf", ".otf", ".ttc" ]:
-                    try:
-                        font_list = [ ttLib.TTFont(str(path_to_font)) ]
-                    except ttLib.TTLibFileIsCollectionError:
-                        font_list = ttLib.TTCollection(str(path_to_font))
+                if path_to_font.suffix.lower() in FONT_SUFFIXES:
+                    font_files.append( str(path_to_font) )
+                else:
+                    LOGGER.warning(f"{path_to_font} is not a supported font type")
 
-                    for font in font_list:
+    scan_file = f"{font_file}.scan"
 
-                        family_name = str( font['name'].getDebugName(1) )
-                        style_name = str( font['name'].getDebugName(2) )
+    # only files that are new or changed since the last run are read
+    scanned = {} if force else load_scan_cache(scan_file)
 
-                        # handle Latin Modern Roman which embeds the point size
-                        # in the style, i.e.
-                        #   [LMRoman][10 Bold]
-                        # ->
-                        #   [LMRoman10][Bold]
+    current = {}
+    for path_to_font in font_files:
+        try:
+            st = os.stat(path_to_font)
+        except OSError:
+            continue
 
-                        match = re.search(r"(\d+) (.+)", style_name)
-                        if match:
+        entry = scanned.get(path_to_font)
 
-                            family_name = family_name + match.group(1)
-                            style_name = match.group(2)
+        if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            current[path_to_font] = entry
+        else:
+            current[path_to_font] = [ st.st_size, st.st_mtime_ns, None ]
 
-                        if family_name not in fonts:
-                            fonts[ family_name ] = {}
+    to_read = [ p for p, entry in current.items() if entry[2] is None ]
 
-                        # Computer Modern's license requires changing the font name for different formats
-                        # (i.e. TeX vs Type1)
-                        if cm_alias in family_name:
-                            if "Computer Modern" not in fonts:
-                                fonts[ "Computer Modern" ] = {}
-                            fonts[ "Computer Modern" ][ style_name ] = str(path_to_font)
+    LOGGER.info(f"Reading {len(to_read)} new or changed font files ({len(current) - len(to_read)} unchanged, {len(set(scanned) - set(current))} removed)")
 
-                        fonts[ family_name ][ style_name ] = str(path_to_font)
+    for path_to_font, names in zip(to_read, read_all_font_names(to_read, jobs)):
+        current[path_to_font][2] = [ list(n) for n in names ]
 
-                else:
-                    LOGGER.warning(f"{path_to_font} is not a supported font type")
+    save_scan_cache(scan_file, current)
+
+    # the results are merged in walk order, so the map is the same
+    # however many processes read the files (or if they were cached)
+    for path_to_font, ( _, _, names ) in current.items():
+
+        for family_name, style_name in names:
+
+            # handle Latin Modern Roman which embeds the point size
+            # in the style, i.e.
+            #   [LMRoman][10 Bold]
+            # ->
+            #   [LMRoman10][Bold]
+
+            match = re.search(r"(\d+) (.+)", style_name)
+            if match:
+
+                family_name = family_name + match.group(1)
+                style_name = match.group(2)
+
+            if family_name not in fonts:
+                fonts[ family_name ] = {}
+
+            # Computer Modern's license requires changing the font name for different formats
+            # (i.e. TeX vs Type1)
+            if cm_alias in family_name:
+                if "Computer Modern" not in fonts:
+                    fonts[ "Computer Modern" ] = {}
+                fonts[ "Computer Modern" ][ style_name ] = path_to_font
+
+            fonts[ family_name ][ style_name ] = path_to_font
 
     for alias in aliases:
 
@@ -177,11 +249,63 @@ def cli(ctx, font_file, font_dir, fallback_font, cm_alias, update_config, alias,
     if echo is True:
         click.echo(_print_fonts())
 
-    with open( font_file, "w") as out:
+    if as_json:
+        with open( font_file, "w") as out:
+
+            LOGGER.info(f"Writing font map to {font_file}")
+
+            json.dump(sorted_fonts, out, indent=2, sort_keys=True)
+    else:
+        LOGGER.info(f"Writing font index to {font_file}")
+
+        write_index(font_file, sorted_fonts, dirs=list(font_dir),
+                    files={ path_to_font : entry[:2] for path_to_font, entry in current.items() },
+                    options=options)
+
+    update_config_file(ctx, font_file, fallback_font, update_config, sorted_fonts)
+
+
+def read_all_font_names(font_files, jobs=1) -> list:
+    """read_font_names() of each of font_files (in the same order), using
+    `jobs` processes (0: one per CPU)"""
+
+    jobs = jobs or os.cpu_count() or 1
+
+    if jobs == 1 or len(font_files) < 2:
+        return [ read_font_names(f) for f in font_files ]
+
+    LOGGER.info(f"Reading {len(font_files)} font files using {jobs} processes")
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list( pool.map(read_font_names, font_files, chunksize=max(1, len(font_files) // (jobs * 8))) )
+
+
+def load_scan_cache(path) -> dict:
+    """font path -> [ size, mtime_ns, [ [ family name, style name ], ... ] ]
+    from the previous run (empty if missing or unreadable)"""
+
+    try:
+        with open(path, "r") as scan:
+            cache = json.load(scan)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(cache, dict) or cache.get("format") != SCAN_CACHE_FORMAT:
+        return {}
+
+    return cache.get("files", {})
+
+
+def save_scan_cache(path, files):
+
+    try:
+        with open(path, "w") as scan:
+            json.dump( { "format" : SCAN_CACHE_FORMAT, "files" : files }, scan)
+    except OSError as e:
+        LOGGER.warning(f"Could not save font scan cache {path}: {e}")
 
-        LOGGER.info(f"Writing font map to {font_file}")
 
-        json.dump(sorted_fonts, out, indent=2, sort_keys=True)
+def update_config_file(ctx, font_file, fallback_font, update_config, fonts):
 
     if update_config is True:
 
@@ -189,5 +313,5 @@ def cli(ctx, font_file, font_dir, fallback_font, cm_alias, update_config, alias,
 
         click.echo( f"Updated font-map in configuration file to {write_config_value_to_file( 'policy.font-map-file', str(abs_font_file), ctx.obj['global.cfg'])}" )
 
-        if fallback_font in sorted_fonts:
+        if fallback_font in fonts:
             click.echo( f"Updated fallback-font in configuration file to {write_config_value_to_file( 'policy.fallback-font', fallback_font, ctx.obj['global.cfg'])}" )
@@ -1,6 +1,9 @@
 
+import hashlib
 import math
 import tempfile
+import time
+from dataclasses import dataclass
 from pathlib import Path
 
 import apryse_sdk as APRYSE
@@ -28,6 +31,51 @@ ELEMENTTYPES = {
         14 : "marked-content-point",
 }
 
+# how saveDocument() writes the file, by options["save-mode"]
+SAVE_MODES = {
+    # complete rewrite, dropping unreferenced objects
+    "full" : APRYSE.SDFDoc.e_remove_unused,
+    # original bytes followed by only the changed/new objects
+    "incremental" : APRYSE.SDFDoc.e_incremental,
+    # complete rewrite, ordered for byte-range serving (fast web view)
+    "linearized" : APRYSE.SDFDoc.e_remove_unused | APRYSE.SDFDoc.e_linearized,
+    # complete rewrite, also merging duplicate objects
+    "compressed" : APRYSE.SDFDoc.e_remove_unused | APRYSE.SDFDoc.e_garbage,
+}
+
+# boxes closer than this (in points) on the same line are drawn as one
+BOX_MERGE_GAP = 0.5
+
+
+@dataclass(frozen=True, slots=True)
+class TextStyle:
+    """Strong head style, resolved once by Apryse.compileTextStyle()"""
+    font : object = None # None to keep the element's font
+    font_size : float = -1.0
+    color_space : object = None
+    color : object = None # None to keep the element's colour
+    components : tuple = ()
+    opacity : float = 1.0
+
+
+@dataclass(frozen=True, slots=True)
+class BoxStyle:
+    """Box style, resolved once by Apryse.compileBoxStyle()"""
+    rgb : dict = None
+    color_space : object = None
+    color : object = None
+    components : tuple = ()
+    opacity : float = 1.0
+    box_width : float = 0.0 # a fraction of the word length if < 1.0
+    box_height : float = 0.0
+    box_shape : str = "box"
+    x_scale : float = 1.0
+    x_offset : float = 0.0
+    y_scale : float = 1.0
+    y_offset : float = 0.0
+    ocr_scale : float = 1.0
+
+
 class Apryse(BaseDocument):
 
     def __init__(self, options=None):
@@ -37,7 +85,18 @@ class Apryse(BaseDocument):
 
         self._ocr_options = None
 
-        self.fonts = None
+        # font object number -> _fontDetails(), for the loaded document
+        self._font_details = {}
+
+        # (font path, embed, subset) -> Font, for the loaded document
+        self._font_cache = {}
+
+        # object number -> the Form XObject it was augmented into (itself,
+        # or a copy), and the object numbers of those being descended
+        self._forms = {}
+        self._form_stack = []
+
+        self._device_rgb_cs = None
 
         if "apryse-token" not in self.options or self.options["apryse-token"] == "":
             LOGGER.critical("Missing Apryse API key")
@@ -77,7 +136,18 @@ class Apryse(BaseDocument):
     def loadDocument(self, filename=""):
         super().loadDocument(filename)
 
-        self.fonts = {}
+        self._font_details = {}
+
+        # fonts belong to the document they were created in
+        self._font_cache = {}
+
+        # object number -> the Form XObject it was augmented into (itself,
+        # or a copy), and the object numbers of those being descended
+        self._forms = {}
+        self._form_stack = []
+
+        # unselectedForms(), when first needed
+        self._unselected_forms = None
 
         self.document = APRYSE.PDFDoc( self.read_file )
 
@@ -88,7 +158,8 @@ class Apryse(BaseDocument):
 
         call_data = notify.OpenDocument(document=self.document,
                                         filename=filename,
-                                        page_count=self.document.GetPageCount())
+                                        page_count=self.document.GetPageCount(),
+                                        fonts=self.scanFonts())
 
         LOGGER.trace("Posting OpenDocument notification")
 
@@ -96,7 +167,56 @@ class Apryse(BaseDocument):
 
         LOGGER.trace("Posted OpenDocument notification")
 
-    def processDocument(self, read_only=True):
+    def scanFonts(self) -> list:
+        """(font family, italic) of every font in the resources of the
+        selected pages, read once so the handler can resolve strong fonts up front
+
+        Fonts only referenced from Form XObjects are not included
+        """
+
+        fonts = {}
+        seen = set()
+
+        for page_number in self.selectedPages():
+
+            res = self.document.GetPage(page_number).GetResourceDict()
+            font_dict = res.FindObj("Font") if res is not None else None
+
+            if font_dict is not None and font_dict.IsDict():
+
+                fitr = font_dict.GetDictIterator()
+                while fitr.HasNext():
+                    obj = fitr.Value()
+
+                    # fonts are normally shared between pages
+                    if not obj.IsIndirect() or obj.GetObjNum() not in seen:
+                        seen.add(obj.GetObjNum())
+
+                        details = self._fontDetails( APRYSE.Font(obj) )
+                        fonts[ (details["font-family"], details["italic"]) ] = True
+
+                    fitr.Next()
+
+        LOGGER.debug(f"Found {len(fonts)} font variants in {self.read_file}")
+
+        return list(fonts)
+
+    def processDocument(self, read_only=True, overlay=False):
+        """Raise BeginPage/ProcessElement/EndPage for every selected page,
+        and with options["page-batch"] a ProcessPage after BeginPage
+        with the page's text, read by the hasElements() pre-scan
+
+        Pages that are not selected (options["pages"]) are not read at
+        all, and neither are selected pages without any element of the
+        types in options["augment-types"] (if set), so both are saved
+        with their original content.
+
+        With `overlay` the page content is only read (elements get no
+        writer), and EndPage gets a writer (and overlay_page) for
+        drawBoxes() to append a new content stream on top of the page -
+        for when only boxes are added, so the original content is never
+        re-written, and pages without boxes are not touched at all
+        """
 
         reader = APRYSE.ElementReader()
         writer = None
@@ -105,19 +225,36 @@ class Apryse(BaseDocument):
             writer = APRYSE.ElementWriter()
             builder = APRYSE.ElementBuilder()
 
+        page_writer = None if overlay else writer
+
         self.page_number = 0
 
-        itr = self.document.GetPageIterator()
+        augment_types = self.options.get("augment-types")
 
-        while itr.HasNext():
+        for page_number in self.selectedPages():
+
+            self.page_number = page_number
 
-            self.page_number += 1
+            page = self.document.GetPage(page_number)
+
+            batch = None
+
+            if self.options.get("page-batch") is True:
+                batch = notify.ProcessPage(document=self.document, page=page, page_number=page_number)
+
+                # the pre-scan reads the whole page to fill the batch
+                found = self.hasElements(reader, page, augment_types, batch=batch) \
+                    or not writer or augment_types is None
+            else:
+                found = not writer or augment_types is None or self.hasElements(reader, page, augment_types)
 
-            page = itr.Current()
+            if writer and not found:
+                LOGGER.info(f"Page {page_number} has nothing to augment, left as is")
+                continue
 
             reader.Begin(page)
-            if writer:
-                writer.Begin(page, APRYSE.ElementWriter.e_replacement, False)
+            if page_writer:
+                page_writer.Begin(page, APRYSE.ElementWriter.e_replacement, False)
 
             rect = page.GetBox( APRYSE.Page.e_media )
 
@@ -137,34 +274,184 @@ class Apryse(BaseDocument):
             LOGGER.trace("Posting BeginPage notification")
             self.notificationCenter().raise_event("BeginPage", begin_page)
 
+            if batch is not None:
+                batch.writer = page_writer
+                batch.builder = builder
+
+                LOGGER.trace("Posting ProcessPage notification")
+                self.notificationCenter().raise_event("ProcessPage", batch)
+
             # reset to zero on each page
             self.ele_index = 0
 
-            self.processPage(reader, writer, builder, page)
+            self.processPage(reader, page_writer, builder, page)
 
-            end_page = notify.EndPage(document=self.document, writer=writer, builder=builder)
+            end_page = notify.EndPage(document=self.document, writer=writer, builder=builder,
+                                      overlay_page=page if overlay and writer else None)
 
             LOGGER.trace("Posting EndPage notification")
             self.notificationCenter().raise_event("EndPage", end_page)
 
             reader.End()
-            if writer:
-                writer.End()
+            if page_writer:
+                page_writer.End()
+
+    def unselectedForms(self) -> frozenset:
+        """Object numbers of the Form XObjects in the resources (or the
+        annotation appearances) of pages that are not selected, and of
+        the forms within those
+
+        Only resource dictionaries are read, not page content, so a form
+        that is listed but never placed is included too
+        """
+
+        selected = set( self.selectedPages() )
+
+        forms = set()
+        todo = []
+
+        for page_number in range(1, self.page_count + 1):
+
+            if page_number in selected:
+                continue
+
+            page = self.document.GetPage(page_number)
+
+            todo.append( page.GetResourceDict() )
+
+            annots = page.GetSDFObj().FindObj("Annots")
+
+            if annots is None or not annots.IsArray():
+                continue
+
+            for i in range(annots.Size()):
+                annot = annots.GetAt(i)
+                appearances = annot.FindObj("AP") if annot.IsDict() else None
+
+                if appearances is not None and appearances.IsDict():
+                    todo.extend( appearance.FindObj("Resources") for appearance in self._appearanceStreams(appearances) )
+
+        while todo:
 
+            res = todo.pop()
+
+            xobjects = res.FindObj("XObject") if res is not None and res.IsDict() else None
+
+            if xobjects is None or not xobjects.IsDict():
+                continue
+
+            itr = xobjects.GetDictIterator()
+            while itr.HasNext():
+                xobj = itr.Value()
+                itr.Next()
+
+                subtype = xobj.FindObj("Subtype") if xobj.IsStream() else None
+
+                if subtype is None or subtype.GetName() != "Form" or xobj.GetObjNum() in forms:
+                    continue
+
+                forms.add( xobj.GetObjNum() )
+                todo.append( xobj.FindObj("Resources") )
+
+        return frozenset(forms)
+
+    def _appearanceStreams(self, appearances) -> list:
+        """The streams of an annotation's appearance dictionary, each of
+        N/R/D is a stream or a dictionary of them (one per state)"""
+
+        streams = []
+
+        itr = appearances.GetDictIterator()
+        while itr.HasNext():
+            value = itr.Value()
             itr.Next()
 
+            if value.IsStream():
+                streams.append(value)
+
+            elif value.IsDict():
+                sitr = value.GetDictIterator()
+                while sitr.HasNext():
+                    if sitr.Value().IsStream():
+                        streams.append( sitr.Value() )
+                    sitr.Next()
+
+        return streams
+
+    def hasElements(self, reader, page, types, batch=None) -> bool:
+        """Cheap pre-scan, True as soon as an element of one of `types`
+        ("text", "image", ...) is read from the page
+
+        With a `batch` (ProcessPage) the whole page is read, and the text
+        of each text element on it (not those within forms) is added to
+        the batch, numbered as processPage() numbers the elements
+        """
+
+        reader.Begin(page)
+
+        try:
+            found = False
+            ele_idx = 0
+
+            ele = reader.Next()
+
+            while ele != None:
+
+                ele_idx += 1
+
+                ele_type = ele.GetType()
+
+                if not found and types is not None:
+                    found = ELEMENTTYPES[ele_type] in types
+
+                if batch is None:
+                    if found:
+                        return True
+
+                elif ele_type == APRYSE.Element.e_text:
+                    batch.ele_idx.append( ele_idx )
+                    batch.types.append( ELEMENTTYPES[ele_type] )
+                    batch.elements.append( ele.GetTextString() )
+
+                ele = reader.Next()
+
+            return found
+
+        finally:
+            reader.End()
+
     def processPage(self, reader, writer, builder, current_page):
         super().processPage(reader, writer, builder, current_page)
 
         page_elements = []
 
+        # element types subscribers want (options["element-types"], all
+        # if None), the others are written through without a notification
+        wanted = self.options.get("element-types")
+
+        if wanted is not None:
+            wanted = { t for t, name in ELEMENTTYPES.items() if name in wanted }
+
         ele = reader.Next()
 
         while ele != None:
 
             self.ele_index += 1
 
-            page_elements.append( ele.GetType() )
+            ele_type = ele.GetType()
+
+            page_elements.append( ele_type )
+
+            if wanted is not None and ele_type not in wanted:
+
+                if ele_type == APRYSE.Element.e_form:
+                    # also writes the placement (of the form, or its copy)
+                    self.processForm(reader, writer, builder, current_page, ele, placed=False)
+                elif writer:
+                    writer.WriteElement(ele)
+
+                ele = reader.Next()
+                continue
 
             rect = ele.GetBBox()
             bounding  = {
@@ -183,16 +470,121 @@ class Apryse(BaseDocument):
                                      page_elements=page_elements,
                                      bbox=bounding,
                                      ele_idx=self.ele_index,
-                                     ele_type=ele.GetType(),
-                                     ele_type_str=ELEMENTTYPES[ele.GetType()],
+                                     ele_type=ele_type,
+                                     ele_type_str=ELEMENTTYPES[ele_type],
                                      element=ele,
+                                     form=self._form_stack[-1] if self._form_stack else 0,
                                      )
 
             LOGGER.trace("Posting Element notification")
             self.notificationCenter().raise_event("ProcessElement", element)
 
+            if ele_type == APRYSE.Element.e_form:
+                self.processForm(reader, writer, builder, current_page, ele)
+
             ele = reader.Next()
 
+    def processForm(self, reader, writer, builder, current_page, ele, placed=True):
+        """Raise ProcessElement for the contents of the Form XObject `ele`,
+        and unless it is already `placed` (by a handler), write its
+        placement
+
+        When writing, the form's content stream is rewritten once per
+        document - the forms done are memoised by object number - and
+        every later placement is descended without a writer, so the
+        handler still sees (and can box) the form's text on each page it
+        is placed on. When only reading (inspect, overlay) every placement
+        is descended the same way.
+
+        With a page selection (options["pages"]) a form that is also
+        placed on pages that are not augmented (unselectedForms()) is
+        copied, and the copy rewritten (and placed) instead of the shared
+        form - other forms are rewritten in place. A form that needs a
+        copy but that a handler has already placed cannot be redirected,
+        so is then only read.
+
+        Forms are not descended at all if the handler wants no elements
+        (options["element-types"] is empty).
+        """
+
+        wanted = self.options.get("element-types")
+
+        form = ele.GetXObject()
+        objnum = form.GetObjNum()
+
+        copy_form = False
+
+        if writer and self.options.get("pages"):
+            if self._unselected_forms is None:
+                self._unselected_forms = self.unselectedForms()
+
+                LOGGER.debug(f"{len(self._unselected_forms)} Form XObjects are on pages that are not selected")
+
+            copy_form = objnum in self._unselected_forms
+
+        form_writer = None
+
+        if writer:
+
+            if objnum not in self._forms and not ( copy_form and placed ) \
+                    and objnum not in self._form_stack and ( wanted is None or wanted ):
+
+                # a shallow copy, its content is rewritten below
+                target = self.document.GetSDFDoc().ImportObj(form, False) if copy_form else form
+
+                self._forms[objnum] = target
+
+                form_writer = APRYSE.ElementWriter()
+
+            if not placed:
+                self._writeFormPlacement(writer, builder, ele, self._forms.get(objnum, form))
+
+        if wanted is not None and not wanted:
+            return
+
+        if objnum in self._form_stack:
+            LOGGER.warning(f"Form XObject {objnum} contains itself, not descending")
+            return
+
+        reader.FormBegin()
+
+        if form_writer:
+            form_writer.Begin(self._forms[objnum])
+            reader.ClearChangeList()
+            form_writer.SetDefaultGState(reader)
+
+        # elements are numbered within the form, so their keys do not
+        # depend on the page it happens to be first seen on
+        page_index = self.ele_index
+        self.ele_index = 0
+        self._form_stack.append(objnum)
+
+        try:
+            self.processPage(reader, form_writer, builder, current_page)
+        finally:
+            self._form_stack.pop()
+            self.ele_index = page_index
+
+        if form_writer:
+            form_writer.End()
+
+        reader.End()
+
+    def _writeFormPlacement(self, writer, builder, ele, target):
+        """Write the placement `ele` of a form, redirected to `target` if
+        that is a copy of the form"""
+
+        if target.GetObjNum() == ele.GetXObject().GetObjNum():
+            writer.WriteElement(ele)
+            return
+
+        # same graphics state (CTM, clip, ...) as the original placement
+        builder.Reset( ele.GetGState() )
+        placement = builder.CreateForm(target)
+        builder.Reset()
+
+        writer.WriteElement(placement)
+
     def writeElement(self, writer, element):
         if writer and element:
             writer.WriteElement(element)
@@ -218,20 +610,131 @@ class Apryse(BaseDocument):
         d.SetCurrentTime()
         info.SetModDate( d )
 
-        self.document.Save(str(self.save_file), APRYSE.SDFDoc.e_remove_unused )
+        if self.options.get("dedup-fonts", True) is True:
+            merged = self.mergeDuplicateFontFiles()
+            if merged:
+                LOGGER.info(f"Merged {merged} duplicate embedded font programs")
+
+        save_mode = self.options.get("save-mode", "full")
+
+        if save_mode not in SAVE_MODES:
+            raise Exception(f"Unknown save mode '{save_mode}' (expected one of {', '.join(SAVE_MODES)})")
+
+        start = time.perf_counter()
+        self.document.Save(str(self.save_file), SAVE_MODES[save_mode] )
+        self.timings["save"] = time.perf_counter() - start
+
         LOGGER.success(f"Saved augmented variant of {self.read_file} to {self.save_file.resolve()}")
 
         if pdfa is True:
-            pdfa_file = self.save_file.replace(".pdf", "_PDFA.pdf")
+            pdfa_file = self.save_file.with_name(f"{self.save_file.stem}_PDFA.pdf")
 
+            self.savePDFA(self.save_file, pdfa_file)
 
-            pdf_a = APRYSE.PDFACompliance(True, self.save_file, None, APRYSE.PDFACompliance.e_Level2B, 0, 10)
+            LOGGER.success(f"Saved PDF/A to {pdfa_file}")
 
-            pdf_a.SaveAs(pdfa_file , False)
+    def savePDFA(self, pdf_file, pdfa_file):
+        """Convert the saved PDF `pdf_file` to PDF/A-2B and save it as
+        `pdfa_file`"""
 
-            LOGGER.success(f"Saved PDF/A to {pdfa_file}")
+        start = time.perf_counter()
+        pdf_a = APRYSE.PDFACompliance(True, str(pdf_file), None, APRYSE.PDFACompliance.e_Level2B, 0, 10)
+        self.timings["pdfa-convert"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pdf_a.SaveAs(str(pdfa_file), False)
+        self.timings["pdfa-save"] = time.perf_counter() - start
+
+    def mergeDuplicateFontFiles(self) -> int:
+        """Point every FontDescriptor at the first of any byte-identical
+        embedded font programs, the duplicates are then dropped by
+        Save(e_remove_unused)
+
+        Returns the number of font programs merged
+        """
+
+        sdf = self.document.GetSDFDoc()
+
+        # (FontFile key, digest) -> first stream with that content
+        seen = {}
+        merged = 0
 
+        for objnum in range(1, sdf.XRefSize()):
 
+            obj = sdf.GetObj(objnum)
+
+            if obj is None or obj.IsFree() or not obj.IsDict():
+                continue
+
+            typ = obj.FindObj("Type")
+            if typ is None or not typ.IsName() or typ.GetName() != "FontDescriptor":
+                continue
+
+            for key in ( "FontFile", "FontFile2", "FontFile3" ):
+
+                font_file = obj.FindObj(key)
+
+                if font_file is None or not font_file.IsStream():
+                    continue
+
+                first = seen.setdefault( ( key, self._streamDigest(font_file) ), font_file )
+
+                if first.GetObjNum() != font_file.GetObjNum():
+                    obj.Put(key, first)
+                    merged += 1
+
+        return merged
+
+    def _objText(self, value) -> str:
+        """Canonical text of a (direct) PDF object, i.e. a filter name
+        or array, or a DecodeParms dictionary"""
+
+        if value is None or value.IsNull():
+            return ""
+
+        if value.IsName():
+            return "/" + value.GetName()
+
+        if value.IsNumber():
+            return str(value.GetNumber())
+
+        if value.IsBool():
+            return str(value.GetBool())
+
+        if value.IsArray():
+            return "[" + " ".join( self._objText( value.GetAt(i) ) for i in range(value.Size()) ) + "]"
+
+        if value.IsDict() and not value.IsStream():
+            entries = []
+            itr = value.GetDictIterator()
+
+            while itr.HasNext():
+                entries.append( f"/{itr.Key().GetName()} {self._objText( itr.Value() )}" )
+                itr.Next()
+
+            return "<<" + " ".join( sorted(entries) ) + ">>"
+
+        # anything else (strings, streams) is never shared between fonts
+        return f"#{value.GetObjNum()}"
+
+    def _streamDigest(self, stream) -> bytes:
+        """Hash of the raw (still encoded) stream data and the entries
+        needed to decode it"""
+
+        digest = hashlib.blake2b(digest_size=16)
+
+        for key in ( "Filter", "DecodeParms", "Subtype", "Length1", "Length2", "Length3" ):
+            digest.update( f"{key}={self._objText( stream.FindObj(key) )};".encode() )
+
+        reader = APRYSE.FilterReader( stream.GetRawStream(False) )
+
+        while True:
+            chunk = reader.Read(65536)
+            if not chunk:
+                break
+            digest.update(chunk)
+
+        return digest.digest()
 
     def getImageDetails(self, ele=None) -> dict():
         if ele is None:
@@ -252,40 +755,79 @@ class Apryse(BaseDocument):
 
     def getTextDetails(self, ele) -> dict():
         rect = ele.GetBBox()
-        txt = ele.GetTextString()
-        fnt = ele.GetGState().GetFont()
-        font_family = fnt.GetFamilyName() or fnt.GetName()
-        name = fnt.GetName() or fnt.GetFamilyName()
-        sz = ele.GetGState().GetFontSize()
-
-        self.fonts[(sz,name)] =  fnt
-
-        desc = fnt.GetDescriptor()
-        italic = fnt.IsItalic()
+        gs = ele.GetGState()
+        fnt = gs.GetFont()
 
-        if desc:
-            itr = desc.GetDictIterator()
-            while itr.HasNext():
-                key = itr.Key()
-                value = itr.Value()
-                if key.GetName() == "ItalicAngle" and not math.isclose( value.GetNumber(), 0.0 ) :
-                    italic = True
-                itr.Next()
+        details = self._fontDetails(fnt)
 
         return {
-            "text" : txt,
+            "text" : ele.GetTextString(),
             "font" : fnt,
-            "font-name" : name,
-            "font-family" : font_family,
-            "italic" : italic,
-            "font-size" : sz,
-            "font-type" : fnt.GetType(),
+            "font-name" : details["font-name"],
+            "font-family" : details["font-family"],
+            "italic" : details["italic"],
+            "font-size" : gs.GetFontSize(),
+            "font-type" : details["font-type"],
             "x" : rect.GetX1(),
             "y" : rect.GetY1(),
             "length" : rect.GetX2() - rect.GetX1(),
             "height" : rect.GetY2() - rect.GetY1(),
         }
 
+    def _fontDetails(self, fnt) -> dict:
+        """Name, family, italic and type of `fnt`, worked out once per
+        font object in the document (fonts are shared by every element
+        that uses them)"""
+
+        objnum = fnt.GetSDFObj().GetObjNum()
+
+        details = self._font_details.get(objnum) if objnum else None
+
+        if details is None:
+
+            italic = fnt.IsItalic()
+
+            desc = fnt.GetDescriptor()
+
+            if desc:
+                angle = desc.FindObj("ItalicAngle")
+                if angle is not None and angle.IsNumber() and not math.isclose( angle.GetNumber(), 0.0 ):
+                    italic = True
+
+            details = {
+                "font-name" : fnt.GetName() or fnt.GetFamilyName(),
+                "font-family" : fnt.GetFamilyName() or fnt.GetName(),
+                "italic" : italic,
+                "font-type" : fnt.GetType(),
+            }
+
+            # direct (object number 0) font dicts can't be told apart
+            if objnum:
+                self._font_details[objnum] = details
+
+        return details
+
+    def getFont(self, font_path, embed=True, subset=True) -> object:
+        """TrueType font for `font_path`, created (and embedded) once per
+        document so every strong head shares the same font object"""
+
+        key = ( font_path, embed, subset )
+
+        fnt = self._font_cache.get(key)
+
+        if fnt is None:
+
+            LOGGER.debug(f"Creating font from {font_path} embed={embed} subset={subset}")
+
+            # subsetting is done on Save(), only glyphs used by the
+            # strong heads are embedded
+            fnt = APRYSE.Font.CreateTrueTypeFont( self.document.GetSDFDoc(), font_path, embed, subset )
+
+            if self.options.get("font-cache", True) is True:
+                self._font_cache[key] = fnt
+
+        return fnt
+
     def updateTextInElement(self, writer, ele, txt, style=None) -> object:
         """TODO
         this currently only handles UTF-8 (i.e. pdflatex), it does not
@@ -293,7 +835,8 @@ class Apryse(BaseDocument):
         (simple vs complex fonts?)
         """
 
-        style = style or {}
+        if not isinstance(style, TextStyle):
+            style = self.compileTextStyle(style or {})
 
         gs = ele.GetGState()
 
@@ -301,33 +844,102 @@ class Apryse(BaseDocument):
         td = ele.GetTextData()
         ele.SetTextData(td[:head_len], len(td[:head_len]) )
 
+        if style.font is not None:
+            gs.SetFont(style.font, style.font_size)
 
-        if "font-path" in style and "font-size" in style:
+        if style.color is not None:
+            self._applyFill(gs, style)
 
-            if style['font-path'] and style['font-size'] > 0.0:
+        return ele
+
+    def _applyFill(self, gs, style):
+        """Set the fill colour/opacity of `gs` to the style's, but only
+        the attributes that differ - every Set marks the GState as
+        changed, so the writer emits the operator again (and a new
+        ExtGState for opacity) even if the value is the same"""
 
-                LOGGER.debug(f"Using {style['font-path']}")
+        if gs.GetFillColorSpace().GetType() != APRYSE.ColorSpace.e_device_rgb:
+            gs.SetFillColorSpace(style.color_space)
+            gs.SetFillColor(style.color)
+        else:
+            current = gs.GetFillColor()
+            if ( current.Get(0), current.Get(1), current.Get(2) ) != style.components:
+                gs.SetFillColor(style.color)
 
-                fnt = APRYSE.Font.CreateTrueTypeFont(
-                        self.document.GetSDFDoc(),
-                        style["font-path"] )
+        if not math.isclose( gs.GetFillOpacity(), style.opacity ):
+            gs.SetFillOpacity(style.opacity)
 
+    def compileTextStyle(self, style) -> TextStyle:
+        """Resolve a text style dict (font-path, font-size, text-color,
+        text-rgb) into the objects updateTextInElement() applies"""
 
-                LOGGER.debug(f"Using {style['font-path']} @ {style['font-size']} as strong")
-                gs.SetFont(fnt, style['font-size'])
+        font = None
+        font_size = style.get("font-size", -1.0)
 
-            else:
-                LOGGER.detail("No font specified in style")
+        if style.get("font-path") and font_size > 0.0:
 
-        if "text-color" in style and len(style['text-color']) > 6:
+            font = self.getFont( style["font-path"], subset=self.options.get("subset-fonts", True) )
+
+            LOGGER.debug(f"Using {style['font-path']} @ {font_size} as strong")
+        else:
+            LOGGER.debug("No font specified in style")
+
+        color_space = None
+        color = None
+        components = ()
+        opacity = 1.0
+
+        if len(style.get("text-color") or "") > 6:
             # text-color is #rrggbbaa string, convert to 0.0->1.0
-            rgb = self._txt_to_rgb(style['text-color'])
+            # (unless the caller has already done so)
+            rgb = style.get("text-rgb") or self._txt_to_rgb(style['text-color'])
 
-            gs.SetFillColorSpace(APRYSE.ColorSpace.CreateDeviceRGB())
-            gs.SetFillColor(APRYSE.ColorPt( rgb["red"],rgb["green"],rgb["blue"]))
-            gs.SetFillOpacity(rgb["alpha"])
+            color_space = self._device_rgb()
+            color = APRYSE.ColorPt( rgb["red"],rgb["green"],rgb["blue"])
+            components = ( rgb["red"],rgb["green"],rgb["blue"] )
+            opacity = rgb["alpha"]
 
-        return ele
+        return TextStyle( font=font, font_size=font_size, color_space=color_space, color=color,
+                         components=components, opacity=opacity )
+
+    def compileBoxStyle(self, style) -> BoxStyle:
+        """Resolve a box style dict (as used by newBox()) once, rather
+        than for every box"""
+
+        rgb = style.get("box-rgb")
+        if rgb is None and "box-color" in style:
+            rgb = self._txt_to_rgb(style['box-color'])
+
+        ocr_scale = 1.0
+
+        if "dpi" in self.options:
+            ocr_scale =  self.options["dpi"] / 72.0
+
+        if "dpi" in style:
+            ocr_scale =  style["dpi"] / 72.0
+
+        return BoxStyle(
+            rgb = rgb,
+            color_space = self._device_rgb(),
+            color = APRYSE.ColorPt( rgb["red"],rgb["green"],rgb["blue"]) if rgb else None,
+            components = ( rgb["red"],rgb["green"],rgb["blue"] ) if rgb else (),
+            opacity = rgb["alpha"] if rgb else 1.0,
+            box_width = style.get("box-width", 0.0),
+            box_height = style.get("box-height", 0.0),
+            box_shape = style.get("box-shape", "box"),
+            x_scale = style.get("x-scale", 1.0),
+            x_offset = style.get("x-offset", 0.0),
+            y_scale = style.get("y-scale", 1.0),
+            y_offset = style.get("y-offset", 0.0),
+            ocr_scale = ocr_scale,
+        )
+
+    def _device_rgb(self):
+
+        if self._device_rgb_cs is None:
+            self._device_rgb_cs = APRYSE.ColorSpace.CreateDeviceRGB()
+
+        return self._device_rgb_cs
 
     def _txt_to_rgb(self, txt):
 
@@ -385,90 +997,158 @@ class Apryse(BaseDocument):
             desc['width'],
             desc['height'])
 
-        box.SetPathStroke(False)
-        box.SetPathFill(True)
+        self._fillBox(box, desc)
 
-        rgb = desc['rgb']
+        self.writePlacedElement( writer, box )
 
-        box.GetGState().SetFillColorSpace(APRYSE.ColorSpace.CreateDeviceRGB())
-        box.GetGState().SetFillColor(APRYSE.ColorPt( rgb["red"],rgb["green"],rgb["blue"]))
-        box.GetGState().SetFillOpacity(rgb["alpha"])
+    def drawBoxes(self, writer, builder, boxes, overlay_page=None):
+        """Draw all of a page's boxes, as one filled path per colour
 
-        self.writePlacedElement( writer, box )
+        Boxes on the same line that touch or overlap are merged into a
+        single rectangle, and the writer is flushed once at the end
+        rather than once per box
 
+        With `overlay_page` the writer is begun (and ended) on it here,
+        so a page without boxes does not get an empty content stream
+        """
 
-    def newBox(self, obj, style=None) -> dict:
+        if not writer or not boxes:
+            return
 
-        desc = {}
-        style = style or {}
+        if overlay_page is not None:
+            writer.Begin(overlay_page, APRYSE.ElementWriter.e_overlay, False)
 
-        # obj is the demensions we get from OCR (needs DPI correction)
-        # style is policy based
-        LOGGER.info(f"Word @ {obj}")
-        LOGGER.info(f"Style @ {style}")
+        for desc, rects in self.coalesceBoxes(boxes):
 
-        desc["width"] = 0
-        desc["height"] = 0
+            builder.PathBegin()
 
-        ocr_scale = 1.0
+            for x, y, width, height in rects:
+                builder.Rect(x, y, width, height)
 
-        if "dpi" in self.options:
-            ocr_scale =  self.options["dpi"] / 72.0
+            path = builder.PathEnd()
 
-        if "dpi" in style:
-            ocr_scale =  style["dpi"] / 72.0
+            self._fillBox(path, desc)
 
-        if "box-width" in style:
-            desc["width"] = style['box-width']
+            writer.WritePlacedElement(path)
 
-        if desc["width"] < 1.0 and 'length' in obj:
-            # width is a fraction, so multiply if by overall word length
-            desc["width"] = style['box-width'] * ( obj['length'] )
+        if overlay_page is not None:
+            writer.End()
+        else:
+            writer.Flush()
 
-        # From experiment, the image is stored in the element at original
-        # resolution, but the element bbox may be smaller.
-        # OCR reports the word coords based on original resolution
-        x_scale = 1.0
-        y_scale = 1.0
-        x_offset = 0.0
-        y_offset = 0.0
+    @staticmethod
+    def coalesceBoxes(boxes) -> list:
+        """[ ( first box descriptor, [ (x, y, width, height) ] ) ] per fill
+        colour, with boxes of the same line and height that touch (within
+        BOX_MERGE_GAP) merged"""
+
+        groups = {}
+
+        for desc in boxes:
+            rgb = desc['rgb']
+            key = ( rgb["red"], rgb["green"], rgb["blue"], rgb["alpha"] )
+
+            if key not in groups:
+                groups[key] = ( desc, [] )
 
-        if "x-scale" in style:
-            x_scale = style['x-scale']
-        if "y-scale" in style:
-            y_scale = style['y-scale']
+            groups[key][1].append( ( desc['x'], desc['y'], desc['width'], desc['height'] ) )
 
-        if "x-offset" in style:
-            x_offset = style['x-offset']
-        if "y-offset" in style:
-            y_offset = style['y-offset']
+        coalesced = []
 
-        desc["width"] = desc["width"] * x_scale * ocr_scale
+        for desc, rects in groups.values():
 
-        if "box-height" in style:
-            desc["height"] = style['box-height']
+            merged = []
 
+            for x, y, width, height in sorted(rects, key=lambda r: ( r[1], r[3], r[0] ) ):
 
-        if desc["height"] == 0:
-            desc["height"] = obj["font-size"] * y_scale
+                if merged:
+                    mx, my, mwidth, mheight = merged[-1]
 
-        if desc["height"] < 1.0:
-            desc["height"] = obj["font-size"] * y_scale * desc["height"]
+                    if math.isclose(y, my) and math.isclose(height, mheight) \
+                            and x <= mx + mwidth + BOX_MERGE_GAP:
+                        merged[-1] = ( mx, my, max( mx + mwidth, x + width ) - mx, mheight )
+                        continue
 
-        desc["x"] = ( ocr_scale * x_scale * obj['x'] ) + x_offset
-        desc["y"] = ( ocr_scale * y_scale * obj['y'] ) + y_offset
+                merged.append( ( x, y, width, height ) )
 
-        if "box-shape" in style:
+            coalesced.append( ( desc, merged ) )
 
-            if style["box-shape"] == "overbar":
-                desc["y"] = desc["y"] + ( obj["font-size"] * y_scale ) - style['box-height']
-            if style["box-shape"] == "underbar":
-                desc["y"] = desc["y"] - style['box-height'] - 1
+        return coalesced
 
-        if "box-color" in style:
-            desc["rgb"] = self._txt_to_rgb(style['box-color'])
+    def _fillBox(self, box, desc):
+
+        box.SetPathStroke(False)
+        box.SetPathFill(True)
+
+        gs = box.GetGState()
+
+        style = desc.get("style")
+
+        if style is not None and style.color is not None:
+            # the builder carries the previous box's state over
+            self._applyFill(gs, style)
+        else:
+            rgb = desc['rgb']
+
+            gs.SetFillColorSpace(self._device_rgb())
+            gs.SetFillColor(APRYSE.ColorPt( rgb["red"],rgb["green"],rgb["blue"]))
+            gs.SetFillOpacity(rgb["alpha"])
+
+
+    def newBox(self, obj, style=None, box_width=None) -> dict:
+        """Box descriptor for (the head of) the word `obj`
+
+        `style` is a BoxStyle from compileBoxStyle() (or a dict, which is
+        compiled for just this box), `box_width` overrides the style's
+        box-width for this word
+        """
+
+        if not isinstance(style, BoxStyle):
+            style = self.compileBoxStyle(style or {})
+
+        # obj is the demensions we get from OCR (needs DPI correction)
+        # style is policy based
+        LOGGER.debug(f"Word @ {obj}")
+
+        width = style.box_width if box_width is None else box_width
+
+        if width < 1.0 and 'length' in obj:
+            # width is a fraction, so multiply if by overall word length
+            width = width * ( obj['length'] )
+
+        # From experiment, the image is stored in the element at original
+        # resolution, but the element bbox may be smaller.
+        # OCR reports the word coords based on original resolution
+        x_scale = style.x_scale
+        y_scale = style.y_scale
+        ocr_scale = style.ocr_scale
+
+        height = style.box_height
+
+        if height == 0:
+            height = obj["font-size"] * y_scale
+
+        if height < 1.0:
+            height = obj["font-size"] * y_scale * height
+
+        x = ( ocr_scale * x_scale * obj['x'] ) + style.x_offset
+        y = ( ocr_scale * y_scale * obj['y'] ) + style.y_offset
+
+        if style.box_shape == "overbar":
+            y = y + ( obj["font-size"] * y_scale ) - style.box_height
+        if style.box_shape == "underbar":
+            y = y - style.box_height - 1
+
+        desc = {
+            "width" : width * x_scale * ocr_scale,
+            "height" : height,
+            "x" : x,
+            "y" : y,
+            "rgb" : style.rgb,
+            "style" : style,
+        }
 
-        LOGGER.info(f"Box @ {desc}")
+        LOGGER.debug(f"Box @ {desc}")
 
         return desc
 
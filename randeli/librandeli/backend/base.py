@@ -3,12 +3,43 @@ import pathlib
 import EventNotifier
 
 
+def parse_pages(value) -> frozenset:
+    """Page numbers from a "3-7,12" style selection (empty for every page)"""
+
+    pages = set()
+
+    for part in str(value or "").split(","):
+
+        part = part.strip()
+
+        if not part:
+            continue
+
+        first, sep, last = part.partition("-")
+
+        try:
+            first = int(first)
+            last = int(last) if sep else first
+        except ValueError as e:
+            raise ValueError(f"Invalid page range '{part}'") from e
+
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid page range '{part}'")
+
+        pages.update( range(first, last + 1) )
+
+    return frozenset(pages)
+
+
 class BaseDocument:
 
     def __init__(self, options=None):
         self._options = options or {}
 
-        self.nc_ = EventNotifier.Notifier(["OpenDocument", "BeginPage", "EndPage", "ProcessElement"])
+        # name -> seconds, of the save steps (for the run report)
+        self.timings = {}
+
+        self.nc_ = EventNotifier.Notifier(["OpenDocument", "BeginPage", "EndPage", "ProcessPage", "ProcessElement"])
 
     def notificationCenter(self) -> EventNotifier.Notifier :
         return self.nc_
@@ -29,6 +60,17 @@ class BaseDocument:
     def processPage(self, reader, writer, builder, current_page):
         pass
 
+    def selectedPages(self) -> list:
+        """Page numbers to process, in order - options["pages"] (from
+        parse_pages()) or every page if that is empty"""
+
+        pages = self.options.get("pages")
+
+        if not pages:
+            return list( range(1, self.page_count + 1) )
+
+        return sorted( p for p in pages if p <= self.page_count )
+
     def saveDocument(self, filename="", in_dir=""):
 
         self.save_file = pathlib.Path(self.read_file).name
@@ -45,6 +87,16 @@ class BaseDocument:
     def getImageDetails(self, ele = None) -> dict():
         return {}
 
+    def compileTextStyle(self, style) -> object:
+        """Backend specific form of a text style dict, built once and
+        passed in place of the dict"""
+        return dict(style)
+
+    def compileBoxStyle(self, style) -> object:
+        """Backend specific form of a box style dict, built once and
+        passed in place of the dict"""
+        return dict(style)
+
     # Properties
     @property
     def options(self):
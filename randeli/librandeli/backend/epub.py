@@ -4,6 +4,7 @@
 # we have limited needs, and want to integrate into notify
 # support like PDF handler, so handle EPUB manually (its a zip file)
 #
+import re
 import zipfile
 from io import BytesIO
 
@@ -55,6 +56,22 @@ class EPUB(BaseDocument):
 
                 self.page_number += 1
 
+                pages = self.options.get("pages")
+
+                if pages and self.page_number not in pages:
+                    # copied through without being parsed
+                    if self.writer:
+                        self.writer.writestr( chap, self.document.read(chap) )
+                    continue
+
+                # read once, for both the tag check and the parse
+                html = self.document.read(chap)
+
+                if not self.isSelected(html):
+                    if self.writer:
+                        self.writer.writestr( chap, html )
+                    continue
+
                 begin_page = notify.BeginPage(document=self.document,
                                          page=chap.filename,
                                          page_count=self.page_count,
@@ -64,7 +81,7 @@ class EPUB(BaseDocument):
                 LOGGER.debug("Posting BeginPage notification")
                 self.notificationCenter().raise_event("BeginPage", begin_page)
 
-                self.processSection(chap, self.writer, None, self.page_number)
+                self.processSection(chap, self.writer, None, self.page_number, html=html)
 
                 end_page = notify.EndPage(document=self.document,
                                           writer=self.writer,
@@ -85,41 +102,78 @@ class EPUB(BaseDocument):
                             self.writer.writestr( chap, file.read() )
 
 
-    def processSection(self, section, writer, builder, current_page):
+    def isSelected(self, html) -> bool:
+        """False (when writing) for a chapter (its raw `html`) without
+        any of the tags in options["augment-types"] - chapters not in
+        options["pages"] are skipped before they are read"""
+
+        augment_types = self.options.get("augment-types")
+
+        if self.writer and augment_types is not None:
+            if not augment_types:
+                return False
+
+            # crude, but much cheaper than parsing the chapter
+            # (matches namespace prefixed tags, i.e. <xhtml:p>, as well)
+            tags = b"|".join( re.escape(tag.encode()) for tag in augment_types )
+
+            return re.search( rb"<(?:[\w.-]+:)?(?:" + tags + rb")[\s/>]", html) is not None
+
+        return True
+
+    def processSection(self, section, writer, builder, current_page, html=None):
         super().processPage(section, writer, builder, current_page)
 
         self.tree = None
 
-        with self.document.open(section) as file:
+        if html is None:
+            html = self.document.read(section)
+
+        self.tree = BeautifulSoup(BytesIO(html), features="xml")
+
+        paragraphs = self.tree.find_all('p')
 
-            html = file.read()
+        if self.options.get("page-batch") is True:
 
-            self.tree = BeautifulSoup(BytesIO(html), features="xml")
+            batch = notify.ProcessPage(document=self.document,
+                                       writer=self.writer,
+                                       builder=self.tree,
+                                       page=current_page,
+                                       page_number=self.page_number,
+                                       ele_idx=list(range(len(paragraphs))),
+                                       types=[ para.name for para in paragraphs ],
+                                       elements=paragraphs)
 
-            ele_idx = 0
-            for para in self.tree.find_all('p'):
-                #for p in para.contents:
-                element = notify.Element(document=self.document,
-                                     reader=None,
-                                     writer=self.writer,
-                                     builder=self.tree,
-                                     page=current_page,
-                                     page_number=self.page_number,
-                                     page_elements=[],#,
-                                     bbox=None,
-                                     ele_idx=ele_idx,
-                                     ele_type=0,
-                                     ele_type_str=para.name,
-                                     element=para,
-                                     )
+            LOGGER.debug("Posting ProcessPage notification")
+            self.notificationCenter().raise_event("ProcessPage", batch)
 
-                LOGGER.debug(f"Posting element notification")
-                self.notificationCenter().raise_event("ProcessElement", element)
+            # and not per element
+            paragraphs = []
 
-                ele_idx += 1
+        ele_idx = 0
+        for para in paragraphs:
+            #for p in para.contents:
+            element = notify.Element(document=self.document,
+                                 reader=None,
+                                 writer=self.writer,
+                                 builder=self.tree,
+                                 page=current_page,
+                                 page_number=self.page_number,
+                                 page_elements=[],#,
+                                 bbox=None,
+                                 ele_idx=ele_idx,
+                                 ele_type=0,
+                                 ele_type_str=para.name,
+                                 element=para,
+                                 )
 
-            if self.writer:
-                self.writer.writestr( section, str(self.tree ) )
+            LOGGER.debug(f"Posting element notification")
+            self.notificationCenter().raise_event("ProcessElement", element)
+
+            ele_idx += 1
+
+        if self.writer:
+            self.writer.writestr( section, str(self.tree ) )
 
     def writeElement(self, element):
         pass
@@ -6,6 +6,8 @@ class OpenDocument:
     document: object = None
     filename: str = ""
     page_count: int = 0
+    # (font family, italic) of the fonts in the page resources
+    fonts: list = field(default_factory=list)
 
 @dataclass
 class BeginPage:
@@ -21,6 +23,10 @@ class EndPage:
     document: object = None
     writer: object = None
     builder: object = None
+    # (overlay mode) the page the writer is to append a content stream
+    # to, only begun if anything is drawn - None if the writer is
+    # already on the page
+    overlay_page: object = None
 
 @dataclass
 class Element:
@@ -36,3 +42,25 @@ class Element:
     ele_type : int = 0
     ele_type_str : str = ""
     element : object = None
+    # object number of the Form XObject the element is in (0 if on the page)
+    form : int = 0
+
+@dataclass
+class ProcessPage:
+    """The elements of a page as one batch, raised (if the backend
+    option "page-batch" is set) after BeginPage
+
+    For EPUB the paragraphs of a chapter, instead of an Element per
+    paragraph. For PDF the text (strings) of the page's text elements,
+    outside forms - an Element is still raised for each, to write it
+
+    The lists are parallel, one entry per element
+    """
+    document: object = None
+    writer: object = None
+    builder: object = None
+    page: object = None
+    page_number: int = 0
+    ele_idx : list = field(default_factory=list)
+    types : list = field(default_factory=list)
+    elements : list = field(default_factory=list)
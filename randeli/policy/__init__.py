@@ -1,3 +1,4 @@
-
+# pylint: disable-next=unused-import
+from .compiled import CompiledPolicy
 # pylint: disable-next=unused-import
 from .rules import Rules
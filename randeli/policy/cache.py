@@ -0,0 +1,93 @@
+from collections import OrderedDict
+
+
+class DecisionCache:
+
+    def __init__(self, maxsize=0):
+        """
+        Bounded LRU cache of augmentation decisions
+
+        A maxsize of 0 disables the cache
+        """
+        self._entries = OrderedDict()
+        self._maxsize = max(int(maxsize), 0)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __str__(self):
+
+        lookups = self.hits + self.misses
+        rate = ( 100.0 * self.hits / lookups ) if lookups else 0.0
+
+        return f"{self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), " \
+            f"{self.evictions} evictions, {len(self)}/{self.maxsize} entries"
+
+    def get(self, key):
+        """Return the cached decision for key, or None"""
+
+        value = self._entries.get(key)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+
+        return value
+
+    def get_many(self, keys) -> list:
+        """Return the cached decision (or None) for each of keys"""
+
+        entries = self._entries
+        move_to_end = entries.move_to_end
+
+        values = [ entries.get(key) for key in keys ]
+
+        hits = 0
+        for key, value in zip(keys, values):
+            if value is not None:
+                move_to_end(key)
+                hits += 1
+
+        self.hits += hits
+        self.misses += len(values) - hits
+
+        return values
+
+    def put(self, key, value):
+
+        if self._maxsize == 0:
+            return
+
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+
+        if len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop all cached decisions (the counters are kept)"""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "hits" : self.hits,
+            "misses" : self.misses,
+            "evictions" : self.evictions,
+            "entries" : len(self),
+            "maxsize" : self.maxsize,
+        }
+
+    @property
+    def enabled(self):
+        return self._maxsize > 0
+
+    @property
+    def maxsize(self):
+        return self._maxsize
@@ -0,0 +1,163 @@
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+from randeli import LOGGER
+
+
+def color_to_rgb(txt) -> dict:
+    """Convert a #rrggbb[aa] string to 0.0->1.0 red/green/blue/alpha"""
+
+    c = txt.replace("#", "")
+    c = c.replace('"', "")
+
+    if len(c) < 6:
+        return { "red" : 1.0, "green" : 0.5, "blue" :0.5, "alpha" : 0.5 }
+
+    r = int(c[0:2], 16)
+    g = int(c[2:4], 16)
+    b = int(c[4:6], 16)
+    a = 255
+    if len(c) > 6:
+        # if alpha supplied as well
+        a = int(c[6:8], 16)
+
+    return { "red" : r / 255.0, "green" : g / 255.0, "blue" : b / 255.0, "alpha" : a / 255.0 }
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledPolicy:
+    """Read-only snapshot of `Rules` for the per-element hot path
+
+    Values are plain (picklable) types resolved once by Rules.compile(),
+    disabled features are already folded in (i.e. `text_color` is empty
+    when colored text is off)
+    """
+
+    use_strong_text : bool = True
+    use_colored_text : bool = True
+    use_strong_box : bool = False
+
+    text_color : str = ""
+    text_rgb : dict = None
+    strong_box_color : str = ""
+    strong_box_rgb : dict = None
+
+    strong_box_height : float = 0.0
+    strong_box_shape : str = "box"
+
+    box_x_scale : float = 1.0
+    box_x_offset : int = 0
+    box_y_scale : float = 1.0
+    box_y_offset : int = 0
+
+    modify_strong_font_size : int = 0
+
+    min_ocr_image_width : int = 0
+    min_ocr_image_height : int = 0
+
+    fallback_font : str = ""
+    # family -> {style: path}, a dict or a FontIndex
+    font_map : Mapping = field(default_factory=dict)
+    # styles available for fallback_font
+    fallback_fonts : dict = field(default_factory=dict)
+    # style used for italic text that falls back to fallback_font
+    fallback_italic_style : str = "Bold"
+
+    def strongFontPath(self, base_font_name : str, italic : bool) -> str:
+        """Same result as Rules.getStrongFontPath(), except an unmapped
+        fallback_font disables font modification rather than raising"""
+
+        path, found = self.resolveStrongFont(base_font_name, italic)
+
+        if not found:
+            LOGGER.warning(f"Could not find {base_font_name} defaulting to {self.fallback_font}")
+
+        return path
+
+    def resolveStrongFont(self, base_font_name : str, italic : bool) -> tuple:
+        """Returns (strong font path, found) where found is False if
+        base_font_name was not in the font map and the fallback was used
+
+        The path is empty if font modification is disabled (or neither
+        font is mapped)
+        """
+
+        if self.use_strong_text is False:
+            return ( "", True )
+
+        styles = self.font_map.get(base_font_name)
+
+        if styles is not None:
+            path = styles.get("Bold", "")
+            if italic:
+                path = styles.get("Bold Italic", styles.get("BoldItalic", path))
+            if path:
+                return ( path, True )
+
+            return ( self.fallback_fonts.get("Bold", ""), False )
+
+        style = self.fallback_italic_style if italic else "Bold"
+
+        return ( self.fallback_fonts.get(style, ""), False )
+
+    def strongFontTable(self, fonts=()):
+        """Per-document lookup table, pre-resolved for the (family, italic) pairs in `fonts`"""
+        return StrongFontTable(self, fonts)
+
+    def strongFontSize(self, size):
+        """Negative to disable modifying the font"""
+        if self.use_strong_text is True:
+            return size + self.modify_strong_font_size
+        return -1.0
+
+
+class StrongFontTable:
+
+    def __init__(self, policy : CompiledPolicy, fonts=()):
+        """
+        Flat (font family, italic) -> strong font path table for one
+        document, any pair not resolved up front is added when first seen
+        """
+        self._policy = policy
+        self._paths = {}
+
+        # (font family, italic) -> substituted path
+        self.misses = {}
+
+        for family, italic in fonts:
+            self._resolve(family, italic)
+
+        if self.misses:
+            LOGGER.warning(f"No strong font mapped for {self.summary()}, defaulting to {policy.fallback_font}")
+
+    def __len__(self):
+        return len(self._paths)
+
+    def lookup(self, family : str, italic : bool) -> str:
+
+        path = self._paths.get( (family, italic) )
+
+        if path is None:
+            path = self._resolve(family, italic)
+
+            if (family, italic) in self.misses:
+                LOGGER.warning(f"No strong font mapped for {family}, defaulting to {self._policy.fallback_font}")
+
+        return path
+
+    def summary(self) -> str:
+        return ", ".join( sorted( f"{family}{' (italic)' if italic else ''}" for family, italic in self.misses ) )
+
+    def _resolve(self, family, italic):
+
+        path, found = self._policy.resolveStrongFont(family, italic)
+
+        if not found:
+            self.misses[ (family, italic) ] = path
+
+        if not path and self._policy.use_strong_text:
+            LOGGER.debug(f"No strong font for {family} italic={italic}, font will not be modified")
+
+        self._paths[ (family, italic) ] = path
+
+        return path
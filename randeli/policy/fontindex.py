@@ -0,0 +1,260 @@
+"""SQLite font index written by `randeli map-fonts`
+
+Families are stored with a normalised key (case, spaces, hyphens,
+subset prefixes and weight/style suffixes folded) so that names taken
+from a PDF, i.e. "ABCDEF+CMUSerif-Bold", still find "CMU Serif".
+
+The index also stores the directories it was built from (with their
+mtimes), the size and mtime of every font file it read and the
+map-fonts options it was built with, so map-fonts can tell when it is
+out of date - including a font replaced in place.
+
+Rules only query the families that are actually looked up, the index
+is never loaded in full.
+"""
+import json
+import os
+import re
+import sqlite3
+from collections.abc import Mapping
+
+# bump if the schema changes
+INDEX_FORMAT = 2
+
+_SQLITE_MAGIC = b"SQLite format 3\x00"
+
+FONT_SUFFIXES = ( ".ttf", ".otf", ".ttc" )
+
+_SUBSET_PREFIX = re.compile(r"^[A-Z]{6}\+")
+_SEPARATORS = re.compile(r"[\s_\-,.]+")
+
+# trailing words that name a weight or style rather than a family
+_STYLE_SUFFIXES = (
+    "thin", "hairline", "extralight", "ultralight", "light", "book", "regular",
+    "normal", "medium", "semibold", "demibold", "demi", "bold", "extrabold",
+    "ultrabold", "heavy", "black", "italic", "oblique", "slanted", "mt", "ps",
+)
+
+_SUFFIX = re.compile( "(?:" + "|".join( sorted(_STYLE_SUFFIXES, key=len, reverse=True) ) + ")$" )
+
+
+def normalise_name(name : str) -> str:
+    """Fold a font family (or PDF font) name to its index key"""
+
+    key = _SEPARATORS.sub("", _SUBSET_PREFIX.sub("", name)).casefold()
+
+    # strip suffixes, but never the whole name ("Black" is a family too)
+    while True:
+        stripped = _SUFFIX.sub("", key)
+        if stripped == key or not stripped:
+            return key
+        key = stripped
+
+
+def read_font_names(path) -> list:
+    """[ (family name, style name) ] of every font in the file at `path`
+
+    Only the table directory and the 'name' table are read
+    """
+
+    from fontTools import ttLib
+
+    with open(path, "rb") as f:
+
+        if f.read(4) == b"ttcf":
+            f.seek(0)
+            fonts = list( ttLib.TTCollection(f, lazy=True) )
+        else:
+            f.seek(0)
+            fonts = [ ttLib.TTFont(f, lazy=True) ]
+
+        return [ ( str( font['name'].getDebugName(1) ), str( font['name'].getDebugName(2) ) ) for font in fonts ]
+
+
+def is_font_index(path) -> bool:
+    """True if `path` is a SQLite font index (rather than a JSON font map)"""
+
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(_SQLITE_MAGIC)) == _SQLITE_MAGIC
+    except OSError:
+        return False
+
+
+def dir_fingerprint(dirs) -> list:
+    """[ directory, mtime_ns ] for every directory under `dirs`
+
+    A directory's mtime changes when files are added to or removed from
+    it, so this changes whenever the set of installed fonts does
+    """
+
+    fingerprint = []
+
+    for dir_ in dirs:
+        for root, _, _ in os.walk(dir_):
+            try:
+                fingerprint.append( [ root, os.stat(root).st_mtime_ns ] )
+            except OSError:
+                pass
+
+    return fingerprint
+
+
+def write_index(path, fonts : dict, dirs=(), files=None, options=None):
+    """Write `fonts` (family -> {style: font path}) as a font index
+
+    `files` is font path -> [ size, mtime_ns ] of every font file under
+    `dirs` the index was built from, `options` the (JSON serialisable)
+    settings it was built with
+    """
+
+    tmp = f"{path}.{os.getpid()}"
+
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    con = sqlite3.connect(tmp)
+
+    try:
+        with con:
+            con.execute("CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT)")
+            # clustered on family, so a lookup is a single b-tree search
+            con.execute("CREATE TABLE fonts (family TEXT, style TEXT, key TEXT, path TEXT, PRIMARY KEY (family, style)) WITHOUT ROWID")
+
+            con.executemany("INSERT INTO fonts VALUES (?, ?, ?, ?)",
+                            ( ( family, style, normalise_name(family), font_path )
+                             for family, styles in fonts.items()
+                             for style, font_path in styles.items() ) )
+
+            con.execute("CREATE INDEX fonts_key ON fonts (key, family)")
+
+            con.execute("CREATE TABLE files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER) WITHOUT ROWID")
+
+            con.executemany("INSERT INTO files VALUES (?, ?, ?)",
+                            ( ( font_path, size, mtime_ns ) for font_path, ( size, mtime_ns ) in ( files or {} ).items() ) )
+
+            con.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ( "format", str(INDEX_FORMAT) ),
+                ( "families", str(len(fonts)) ),
+                ( "dirs", json.dumps( list(dirs) ) ),
+                ( "fingerprint", json.dumps( dir_fingerprint(dirs) ) ),
+                ( "options", json.dumps(options) ),
+            ])
+    finally:
+        con.close()
+
+    os.replace(tmp, path)
+
+
+class FontIndex(Mapping):
+
+    def __init__(self, path):
+        """
+        Read-only, lazily queried font map backed by the index at `path`
+
+        Looking up a family that is not in the index by name falls back
+        to its normalised key
+        """
+        self._path = str(path)
+        self._con = None
+
+        # family -> styles (or None if not found)
+        self._styles = {}
+
+    def __getstate__(self):
+        # the connection cannot be pickled, it is re-opened on first use
+        return { "_path" : self._path, "_con" : None, "_styles" : {} }
+
+    def __repr__(self):
+        return f"FontIndex({self._path!r})"
+
+    @property
+    def path(self):
+        return self._path
+
+    def _connection(self):
+
+        if self._con is None:
+            self._con = sqlite3.connect(f"file:{self._path}?mode=ro", uri=True, check_same_thread=False)
+
+        return self._con
+
+    def _query(self, family):
+
+        con = self._connection()
+
+        rows = con.execute("SELECT style, path FROM fonts WHERE family = ?", (family,)).fetchall()
+
+        if not rows:
+            key = normalise_name(family)
+
+            # several families can share a key, use the first (by name)
+            match = con.execute("SELECT family FROM fonts WHERE key = ? ORDER BY family LIMIT 1", (key,)).fetchone()
+
+            if match:
+                rows = con.execute("SELECT style, path FROM fonts WHERE family = ?", (match[0],)).fetchall()
+
+        return dict(rows) if rows else None
+
+    def __getitem__(self, family):
+
+        if family not in self._styles:
+            self._styles[family] = self._query(family)
+
+        styles = self._styles[family]
+
+        if styles is None:
+            raise KeyError(family)
+
+        return styles
+
+    def __contains__(self, family):
+        try:
+            self[family]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        for (family,) in self._connection().execute("SELECT DISTINCT family FROM fonts ORDER BY family"):
+            yield family
+
+    def __len__(self):
+        return int(self.meta("families", 0))
+
+    def meta(self, name, default=None):
+
+        row = self._connection().execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+
+        return row[0] if row else default
+
+    def isStale(self, dirs=None, options=None) -> bool:
+        """True if fonts have been added/removed under the directories
+        the index was built from, if any font file it read has changed
+        size or mtime (or gone), or if it was built from different `dirs`
+        or with different `options`"""
+
+        if self.meta("format") != str(INDEX_FORMAT):
+            return True
+
+        if options is not None and json.loads( self.meta("options", "null") ) != options:
+            return True
+
+        built_from = json.loads( self.meta("dirs", "[]") )
+
+        if dirs is not None and sorted(dirs) != sorted(built_from):
+            return True
+
+        if json.loads( self.meta("fingerprint", "[]") ) != dir_fingerprint(built_from):
+            return True
+
+        for font_path, size, mtime_ns in self._connection().execute("SELECT path, size, mtime_ns FROM files"):
+            try:
+                st = os.stat(font_path)
+            except OSError:
+                return True
+
+            if st.st_size != size or st.st_mtime_ns != mtime_ns:
+                return True
+
+        return False
@@ -0,0 +1,119 @@
+"""Vectorised character classification for whole arrays of words
+
+The per-character rules match `randeli.policy.rules.word_classes`,
+but a batch of words is classified in a handful of NumPy passes rather
+than a Python loop per character.
+"""
+import string
+
+import numpy as np
+
+NONE = 0
+UPPER = 1
+LOWER = 2
+SPACE = 3
+DIGIT = 4
+PUNCT = 5
+
+CLASSES = 6
+
+# set on top of the class code for characters where str.isalpha() is True
+ALPHA = 0x80
+
+_BMP_TABLE = None
+
+
+def char_class(ch) -> int:
+    """Return the class code (and ALPHA flag) of a single character
+    using the same precedence as word_classes()"""
+
+    if ch.isupper():
+        code = UPPER
+    elif ch.islower():
+        code = LOWER
+    elif ch.isspace():
+        code = SPACE
+    elif ch.isdigit():
+        code = DIGIT
+    elif ch in string.punctuation:
+        code = PUNCT
+    else:
+        code = NONE
+
+    if ch.isalpha():
+        code |= ALPHA
+
+    return code
+
+
+def bmp_table():
+    """Lookup table of class codes for every code point in the
+    Basic Multilingual Plane (built on first use)"""
+
+    global _BMP_TABLE # pylint: disable=global-statement
+
+    if _BMP_TABLE is None:
+        _BMP_TABLE = np.fromiter( (char_class(chr(cp)) for cp in range(0x10000)),
+                                 dtype=np.uint8, count=0x10000)
+
+    return _BMP_TABLE
+
+
+def classify(words):
+    """Classify every character of every word in `words`
+
+    Returns a tuple of
+        - counts: (len(words), CLASSES) array of per-class character counts
+          (periods/commas embedded in numbers are counted as DIGIT)
+        - leading: length of the alphabetic prefix of each word, capped
+          at len(word)-1 to match word_classes()
+        - lengths: number of characters in each word
+    """
+
+    n = len(words)
+
+    lengths = np.fromiter( map(len, words), dtype=np.int64, count=n)
+
+    counts = np.zeros( (n, CLASSES), dtype=np.int64)
+    leading = np.zeros( n, dtype=np.int64)
+
+    total = int(lengths.sum())
+    if total == 0:
+        return counts, leading, lengths
+
+    cps = np.frombuffer( "".join(words).encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+
+    table = bmp_table()
+
+    astral = cps > 0xFFFF
+    codes = table[ np.where(astral, 0, cps) ]
+
+    if astral.any():
+        # rare, so classify outside the BMP one code point at a time
+        idx = np.flatnonzero(astral)
+        codes[idx] = [ char_class(chr(cp)) for cp in cps[idx].tolist() ]
+
+    alpha = ( codes & ALPHA ) != 0
+    cls = codes & np.uint8(0xFF ^ ALPHA)
+
+    word_idx = np.repeat( np.arange(n), lengths)
+    starts = np.cumsum(lengths) - lengths
+    word_len = lengths[word_idx]
+    pos = np.arange(total) - starts[word_idx]
+
+    # punctuation between two digits in the same word is part of a number
+    digit = cls == DIGIT
+    embedded = np.zeros( total, dtype=bool)
+    embedded[1:-1] = ( cls[1:-1] == PUNCT ) & digit[:-2] & digit[2:]
+    embedded &= ( pos > 0 ) & ( pos < word_len - 1 )
+    cls[embedded] = DIGIT
+
+    counts = np.bincount( word_idx * CLASSES + cls, minlength=n * CLASSES ).reshape(n, CLASSES)
+
+    # position of the first non-alphabetic character (or len if none)
+    non_empty = lengths > 0
+    first_other = np.minimum.reduceat( np.where(alpha, word_len, pos), starts[non_empty] )
+
+    leading[non_empty] = np.minimum( first_other, lengths[non_empty] - 1 )
+
+    return counts, leading, lengths
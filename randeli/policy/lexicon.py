@@ -0,0 +1,205 @@
+"""Word lists of words that are never augmented
+
+A lexicon file has one entry per line (blank lines and lines starting
+with '#' are ignored)
+    - entries in lower case match regardless of case ("the" matches "The")
+    - entries with any upper case only match exactly ("US" does not match "us")
+    - entries ending in '*' match any word starting with the entry ("EP1234*")
+
+Words are looked up with surrounding punctuation removed, so "(e.g.," is
+checked as "e.g".
+
+The parsed lexicon is saved next to the file (FILE.idx) and reused for
+as long as the file is unchanged.
+"""
+import functools
+import marshal  # nosec: B302 - only reads indexes written by save_index()
+import os
+import string
+
+# bump if the layout of the saved index changes
+INDEX_FORMAT = 1
+
+# removed from both ends of a word before looking it up
+_STRIP = string.punctuation + string.whitespace + "‘’“”«»"
+
+
+class Lexicon:
+
+    __slots__ = ( "exact", "folded", "exact_prefixes", "folded_prefixes", "_size" )
+
+    def __init__(self, exact=frozenset(), folded=frozenset(), exact_prefixes=None, folded_prefixes=None):
+        """
+        exact/folded are sets of words, the prefixes are dicts of
+        prefix length -> set of prefixes of that length
+        """
+        self.exact = frozenset(exact)
+        self.folded = frozenset(folded)
+        self.exact_prefixes = exact_prefixes or {}
+        self.folded_prefixes = folded_prefixes or {}
+
+        # checked for every word, so not recounted each time
+        self._size = len(self.exact) + len(self.folded) \
+            + sum( map(len, self.exact_prefixes.values()) ) \
+            + sum( map(len, self.folded_prefixes.values()) )
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, word):
+
+        word = word.strip(_STRIP)
+
+        if not word:
+            return False
+
+        if word in self.exact:
+            return True
+
+        folded = word.casefold()
+
+        if folded in self.folded:
+            return True
+
+        for length, prefixes in self.exact_prefixes.items():
+            if word[:length] in prefixes:
+                return True
+
+        for length, prefixes in self.folded_prefixes.items():
+            if folded[:length] in prefixes:
+                return True
+
+        return False
+
+    @classmethod
+    def fromEntries(cls, entries):
+        """Build from an iterable of lexicon file lines"""
+
+        exact = set()
+        folded = set()
+        exact_prefixes = {}
+        folded_prefixes = {}
+
+        for entry in entries:
+
+            entry = entry.strip()
+
+            if not entry or entry.startswith("#"):
+                continue
+
+            prefix = entry.endswith("*")
+            entry = entry.rstrip("*").strip(_STRIP)
+
+            if not entry:
+                continue
+
+            if entry == entry.casefold():
+                if prefix:
+                    folded_prefixes.setdefault(len(entry), set()).add(entry)
+                else:
+                    folded.add(entry)
+            else:
+                if prefix:
+                    exact_prefixes.setdefault(len(entry), set()).add(entry)
+                else:
+                    exact.add(entry)
+
+        return cls( exact, folded,
+                   { n: frozenset(p) for n, p in sorted(exact_prefixes.items()) },
+                   { n: frozenset(p) for n, p in sorted(folded_prefixes.items()) } )
+
+    @classmethod
+    def merge(cls, lexicons):
+        """Single lexicon matching any of `lexicons`"""
+
+        exact = set()
+        folded = set()
+        exact_prefixes = {}
+        folded_prefixes = {}
+
+        for lex in lexicons:
+            exact |= lex.exact
+            folded |= lex.folded
+
+            for n, p in lex.exact_prefixes.items():
+                exact_prefixes[n] = exact_prefixes.get(n, frozenset()) | p
+            for n, p in lex.folded_prefixes.items():
+                folded_prefixes[n] = folded_prefixes.get(n, frozenset()) | p
+
+        return cls( exact, folded, dict(sorted(exact_prefixes.items())), dict(sorted(folded_prefixes.items())) )
+
+    def dump(self) -> tuple:
+        return ( self.exact, self.folded, self.exact_prefixes, self.folded_prefixes )
+
+
+def index_path(path) -> str:
+    return f"{path}.idx"
+
+
+def save_index(path, lexicon, fingerprint):
+    """Write the prebuilt form of `lexicon` next to `path` (best effort)"""
+
+    tmp = f"{index_path(path)}.{os.getpid()}"
+
+    try:
+        with open(tmp, "wb") as idx:
+            marshal.dump( ( INDEX_FORMAT, fingerprint, lexicon.dump() ), idx)
+
+        os.replace(tmp, index_path(path))
+
+    except OSError:
+        # i.e. read-only directory, the lexicon is just rebuilt next time
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def _read_index(path, fingerprint):
+
+    try:
+        with open(index_path(path), "rb") as idx:
+            fmt, saved, data = marshal.load(idx) # nosec: B302
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+    if fmt != INDEX_FORMAT or tuple(saved) != fingerprint:
+        return None
+
+    return Lexicon(*data)
+
+
+@functools.lru_cache(maxsize=16)
+def _load(path, mtime_ns, size) -> Lexicon:
+
+    fingerprint = ( mtime_ns, size )
+
+    lexicon = _read_index(path, fingerprint)
+
+    if lexicon is None:
+        with open(path, "r", encoding="utf-8") as entries:
+            lexicon = Lexicon.fromEntries(entries)
+
+        save_index(path, lexicon, fingerprint)
+
+    return lexicon
+
+
+def load_lexicon(path) -> Lexicon:
+    """Lexicon for the file at `path`, (re)read only when the file changes"""
+
+    st = os.stat(path)
+
+    return _load(path, st.st_mtime_ns, st.st_size)
+
+
+def parse_lexicons(value) -> tuple:
+    """Lexicon paths from config, either a list or a single ',' separated string"""
+
+    if not value:
+        return ()
+
+    if isinstance(value, str):
+        value = value.split(",")
+
+    return tuple( p.strip() for p in value if p.strip() )
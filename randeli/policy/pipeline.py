@@ -0,0 +1,335 @@
+"""Ordered augmentation rules, compiled once into Python callables
+
+Each rule is "augment if EXPR" or "skip if EXPR", the first rule whose
+EXPR is true decides the word, words matching no rule are skipped.
+
+EXPR is a Python-like expression (and/or/not, comparisons, + - * / %)
+over the classifier counts of the word (dividing by zero gives 0,
+and/or/not, comparisons and matches() are true or false and cannot be
+used as numbers)
+    upper_case, lower_case, letters, numeric, punctuation, whitespace,
+    leading_alphabetic, length
+the context of the word
+    words_in_line, lines_in_para
+the policy thresholds (substituted when compiled)
+    min_words_in_line, min_lines_in_para
+and
+    matches("REGEX") - the regex matches somewhere in the word
+
+The rules are compiled into a scalar function (one word) and an
+equivalent vectorised function (NumPy arrays of the above) so there
+is no per-word interpretation.
+"""
+import ast
+import copy
+import re
+
+import numpy as np
+
+# equivalent to the original hard-coded shouldAugment() chain
+DEFAULT_RULES = (
+    "skip if 0 < words_in_line < min_words_in_line",
+    "skip if 0 < lines_in_para < min_lines_in_para",
+    "skip if leading_alphabetic == 0",
+    "skip if upper_case > 0 and lower_case == 0 and numeric > 0",
+    "augment if letters > punctuation",
+)
+
+ACTIONS = {
+    "augment" : True,
+    "skip" : False,
+}
+
+COUNTS = ( "upper_case", "lower_case", "numeric", "punctuation", "whitespace", "leading_alphabetic", "length" )
+
+CONTEXT = ( "words_in_line", "lines_in_para" )
+
+THRESHOLDS = ( "min_words_in_line", "min_lines_in_para" )
+
+# derived values, only computed if a rule uses them
+DERIVED = {
+    "letters" : "upper_case + lower_case",
+}
+
+ARGS = ( "word", ) + COUNTS + CONTEXT
+
+_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod,
+    ast.Name, ast.Load, ast.Constant, ast.Call,
+)
+
+
+class RuleError(ValueError):
+    pass
+
+
+def parse_rules(value) -> tuple:
+    """Rules from config, either a list or a single ';' separated string
+
+    In a config file the list is comma separated, so a rule containing
+    a comma (i.e. matches("[0-9]{1,3}")) must be quoted
+    """
+
+    if not value:
+        return DEFAULT_RULES
+
+    if isinstance(value, str):
+        value = value.split(";")
+
+    rules = tuple( r.strip() for r in value if r.strip() )
+
+    for rule in rules:
+        if rule.partition(" ")[0] not in ACTIONS:
+            # most likely the tail of an unquoted rule, split at a comma
+            raise RuleError(f"'{rule}' is not a rule - quote any rule containing a comma")
+
+    return rules
+
+
+def _parse_rule(rule):
+
+    action, _, expr = rule.partition(" if ")
+
+    action = action.strip()
+
+    if action not in ACTIONS or not expr.strip():
+        raise RuleError(f"Rule must be 'augment if EXPR' or 'skip if EXPR', not '{rule}'")
+
+    try:
+        tree = ast.parse(expr.strip(), mode="eval")
+    except SyntaxError as e:
+        raise RuleError(f"Invalid expression in rule '{rule}': {e.msg}") from e
+
+    functions = set()
+
+    # walk() is breadth first, so calls are checked before their names
+    for node in ast.walk(tree):
+
+        if not isinstance(node, _NODES):
+            raise RuleError(f"'{type(node).__name__}' is not supported in rule '{rule}'")
+
+        if isinstance(node, ast.Call):
+            if not ( isinstance(node.func, ast.Name) and node.func.id == "matches" \
+                    and len(node.args) == 1 and not node.keywords \
+                    and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str) ):
+                raise RuleError(f"Only matches(\"REGEX\") may be called in rule '{rule}'")
+
+            functions.add(node.func)
+
+        if isinstance(node, ast.Name) and node not in functions \
+                and node.id not in COUNTS + CONTEXT + THRESHOLDS + tuple(DERIVED):
+            raise RuleError(f"Unknown name '{node.id}' in rule '{rule}'")
+
+        _check_operands(rule, node)
+
+    return ACTIONS[action], tree.body
+
+
+def _is_truth_value(node) -> bool:
+    return isinstance(node, ( ast.BoolOp, ast.Compare, ast.Call )) \
+        or ( isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not) )
+
+
+def _check_operands(rule, node):
+    """Reject and/or (and other truth values) used as numbers
+
+    Python's and/or give one of their operands, the vectorised rules
+    element-wise booleans, so "(upper_case or numeric) > 1" would decide
+    words differently depending on the size of the batch they are in"""
+
+    if isinstance(node, ast.BinOp):
+        operands = [ node.left, node.right ]
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        operands = [ node.operand ]
+    elif isinstance(node, ast.Compare):
+        # a truth value compared with another is the same either way
+        operands = [ n for n in [ node.left ] + node.comparators if isinstance(n, ast.BoolOp) ]
+    else:
+        return
+
+    if any( _is_truth_value(n) for n in operands ):
+        raise RuleError(f"and/or, not, comparisons and matches() are true or false, not numbers, in rule '{rule}'")
+
+
+class _Specialise(ast.NodeTransformer):
+    """Substitute thresholds and bind regexes to module level names"""
+
+    def __init__(self, thresholds, regexes):
+        self.thresholds = thresholds
+        self.regexes = regexes
+
+    def visit_Name(self, node):
+        if node.id in self.thresholds:
+            return ast.copy_location(ast.Constant(self.thresholds[node.id]), node)
+        return node
+
+    def visit_Call(self, node):
+        name = f"_re{len(self.regexes)}"
+        self.regexes[name] = re.compile(node.args[0].value)
+
+        return ast.copy_location(ast.Call(func=ast.Name(name, ast.Load()), args=[ast.Name("word", ast.Load())], keywords=[]), node)
+
+
+class _Divide(ast.NodeTransformer):
+    """a / b -> div(a, b), a % b -> mod(a, b), so a zero divisor (i.e.
+    "letters / punctuation" for a word without punctuation) gives 0"""
+
+    def __init__(self, div, mod):
+        self.funcs = { ast.Div : div, ast.Mod : mod }
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+
+        func = self.funcs.get(type(node.op))
+        if func is None:
+            return node
+
+        return ast.copy_location(ast.Call(func=ast.Name(func, ast.Load()), args=[node.left, node.right], keywords=[]), node)
+
+
+def _div(a, b):
+    return a / b if b else 0
+
+
+def _mod(a, b):
+    return a % b if b else 0
+
+
+def _vdiv(a, b):
+    out = np.zeros(np.broadcast(a, b).shape)
+    return np.divide(a, b, out=out, where=np.asarray(b) != 0)
+
+
+def _vmod(a, b):
+    out = np.zeros(np.broadcast(a, b).shape, dtype=np.result_type(a, b))
+    return np.mod(a, b, out=out, where=np.asarray(b) != 0)
+
+
+class _Scalar(ast.NodeTransformer):
+
+    def visit_Call(self, node):
+        # _reN(word) -> _reN.search(word) is not None
+        return ast.Compare(
+            left=ast.Call(func=ast.Attribute(node.func, "search", ast.Load()), args=node.args, keywords=[]),
+            ops=[ast.IsNot()], comparators=[ast.Constant(None)])
+
+
+def _chain(func, values):
+    """func(a, func(b, c)) for element-wise and/or over values"""
+
+    node = values[-1]
+    for value in reversed(values[:-1]):
+        node = ast.Call(func=ast.Name(func, ast.Load()), args=[value, node], keywords=[])
+
+    return node
+
+
+class _Vector(ast.NodeTransformer):
+    """Python boolean logic -> element-wise NumPy"""
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+
+        return _chain("_and" if isinstance(node.op, ast.And) else "_or", node.values)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+
+        if isinstance(node.op, ast.Not):
+            return ast.Call(func=ast.Name("_not", ast.Load()), args=[node.operand], keywords=[])
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+
+        if len(node.ops) == 1:
+            return node
+
+        # a < b < c -> (a < b) & (b < c)
+        left = node.left
+        pairs = []
+        for op, right in zip(node.ops, node.comparators):
+            pairs.append( ast.Compare(left=left, ops=[op], comparators=[right]) )
+            left = right
+
+        return _chain("_and", pairs)
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Name) and node.func.id.startswith("_re"):
+            # _reN(word) -> _matches(_reN, words)
+            return ast.Call(func=ast.Name("_matches", ast.Load()), args=[node.func, ast.Name("word", ast.Load())], keywords=[])
+
+        self.generic_visit(node)
+        return node
+
+
+def _matches(regex, words):
+    return np.fromiter( ( regex.search(w) is not None for w in words ), dtype=bool, count=len(words) )
+
+
+class Pipeline:
+
+    def __init__(self, rules=DEFAULT_RULES, thresholds=None):
+        """
+        Compile `rules` with `thresholds` (min_words_in_line, ...) fixed
+        """
+
+        self.rules = tuple(rules)
+
+        regexes = {}
+        specialise = _Specialise(thresholds or {}, regexes)
+
+        parsed = [ ( action, specialise.visit(expr) ) for action, expr in map(_parse_rule, self.rules) ]
+
+        used = { node.id for _, expr in parsed for node in ast.walk(expr) if isinstance(node, ast.Name) }
+
+        prelude = [ f"    {name} = {expr}" for name, expr in DERIVED.items() if name in used ]
+
+        # scalar, first matching rule wins
+        # (each transform works on its own copy, they rewrite in place)
+        body = [ f"    if {ast.unparse(_Divide('_div', '_mod').visit(_Scalar().visit(copy.deepcopy(expr))))}: return {action}"
+                 for action, expr in parsed ]
+
+        scalar_src = "\n".join( [ f"def scalar({', '.join(ARGS)}):" ] + prelude + body + [ "    return False" ] )
+
+        # vectorised, nested where() from the last rule outwards
+        result = "_false"
+        for action, expr in reversed(parsed):
+            vexpr = _Divide('_vdiv', '_vmod').visit(_Vector().visit(copy.deepcopy(expr)))
+            result = f"_where({ast.unparse(vexpr)}, {action}, {result})"
+
+        vector_src = "\n".join( [ f"def vector({', '.join(ARGS)}):",
+                                  "    _false = _zeros(len(word), dtype=bool)" ] + prelude + [ f"    return _asbool({result})" ] )
+
+        namespace = dict(regexes)
+        namespace.update({
+            "_and" : np.logical_and,
+            "_or" : np.logical_or,
+            "_not" : np.logical_not,
+            "_where" : np.where,
+            "_zeros" : np.zeros,
+            "_asbool" : lambda a: np.asarray(a, dtype=bool),
+            "_matches" : _matches,
+            "_div" : _div,
+            "_mod" : _mod,
+            "_vdiv" : _vdiv,
+            "_vmod" : _vmod,
+        })
+
+        # the source is generated from ASTs that _parse_rule() has
+        # restricted to arithmetic, comparisons and matches() over the
+        # names above, so cannot run arbitrary code - and compiling it
+        # once is what keeps rules as fast as the hard-coded chain was
+        # pylint: disable-next=exec-used
+        exec(compile(scalar_src + "\n\n" + vector_src, "<policy.rules>", "exec"), namespace) # nosec: B102
+
+        self.scalar = namespace["scalar"]
+        self.vector = namespace["vector"]
+
+        self.source = scalar_src + "\n\n" + vector_src
+
+        # does the outcome depend on more than whether the context is
+        # below the thresholds (the only way the default rules use it)
+        self.raw_context = self.rules != DEFAULT_RULES and bool( used & set(CONTEXT) )
@@ -1,14 +1,26 @@
 
+import bisect
+import functools
+import hashlib
 import json
+import os
 import pprint
 import random
-import string
+import re
 from dataclasses import dataclass
 
+import numpy as np
 import pydantic
 
 from randeli import LOGGER
 
+from . import kernel
+from .cache import DecisionCache
+from .compiled import CompiledPolicy, color_to_rgb
+from .fontindex import FontIndex, is_font_index
+from .lexicon import Lexicon, load_lexicon, parse_lexicons
+from .pipeline import DEFAULT_RULES, Pipeline, parse_rules
+
 KEYS={
     'policy.box_x_scale' : {
         "type" : "float",
@@ -26,6 +38,10 @@ KEYS={
         "type" : "int",
         "default" : 0
     },
+    'policy.decision_cache_size' : {
+        "type" : "int",
+        "default" : 8192
+    },
     'policy.fallback-font' : {
         "type" : "str",
         "default" : "CMU Serif"
@@ -34,6 +50,14 @@ KEYS={
         "type" : "str",
         "default" : None
     },
+    'policy.head_len_table' : {
+        "type" : "str",
+        "default" : "" # i.e. "1:1,5:2,8:3,12:4" word-length:max-head-length
+    },
+    'policy.lexicons' : {
+        "type" : "list",
+        "default" : () # word list files, words in them are never augmented
+    },
     'policy.max_head_len' : {
         "type" : "int",
         "default" : 4
@@ -62,6 +86,10 @@ KEYS={
         "type" : "int",
         "default" : 0
     },
+    'policy.rules' : {
+        "type" : "list",
+        "default" : DEFAULT_RULES
+    },
     'policy.seed' : {
         "type" : "int",
         "default" : 230901
@@ -70,6 +98,10 @@ KEYS={
         "type" : "str",
         "default" : "#011993"
     },
+    'policy.split_mode' : {
+        "type" : "str",
+        "default" : "random" # "random", "hashed"
+    },
     'policy.strong_box_color' : {
         "type" : "str",
         "default" : "#01199330"
@@ -101,6 +133,12 @@ class WordDetails:
     head : str = ""
     tail : str = ""
 
+@dataclass
+class WordDecisions:
+    """Per-word results of Rules.evaluate_many()"""
+    augment : np.ndarray = None
+    head_len : np.ndarray = None
+
 @dataclass(frozen=False, slots=True)
 class WordInfo:
     txt : str = ""
@@ -111,6 +149,102 @@ class WordInfo:
     whitespace: int = 0
     leading_alphabetic:  int = 0
 
+# one symbol per character class, upper case symbols are alphabetic
+_CLASS_SYMBOLS = {
+    kernel.NONE : "n",
+    kernel.UPPER : "u",
+    kernel.LOWER : "l",
+    kernel.SPACE : "s",
+    kernel.DIGIT : "d",
+    kernel.PUNCT : "p",
+    kernel.NONE | kernel.ALPHA : "A",
+    kernel.UPPER | kernel.ALPHA : "U",
+    kernel.LOWER | kernel.ALPHA : "L",
+}
+
+class _ClassTable(dict):
+    """str.translate() table mapping code points to class symbols,
+    prefilled for ASCII with anything else classified (and cached)
+    the first time it is seen"""
+
+    def __missing__(self, cp):
+        sym = self[cp] = _CLASS_SYMBOLS[ kernel.char_class(chr(cp)) ]
+        return sym
+
+_CLASS_TABLE = _ClassTable( (cp, _CLASS_SYMBOLS[ kernel.char_class(chr(cp)) ]) for cp in range(128) )
+
+# punctuation between two digits is part of a number
+_EMBEDDED_IN_NUMBER = re.compile(r"(?<=d)p(?=d)")
+
+# ASCII character -> class (without the ALPHA bit, ASCII letters are
+# exactly the upper and lower case characters)
+_ASCII_CLASS = { chr(cp) : kernel.char_class(chr(cp)) & ~kernel.ALPHA for cp in range(128) }
+
+# below this length a loop over an ASCII word beats translating it
+_SHORT_WORD = 10
+
+
+def word_counts(txt) -> tuple:
+    """( upper_case, lower_case, numeric, punctuation, whitespace,
+    leading_alphabetic ) of a non-empty word, as word_classes() counts
+    them but without building a WordInfo (this is the per word hot path)
+    """
+
+    n = len(txt)
+
+    if n <= _SHORT_WORD and txt.isascii():
+
+        # most words are only letters
+        if txt.isalpha():
+            if txt.islower():
+                return ( 0, n, 0, 0, 0, n - 1 )
+
+            upper = n if txt.isupper() else sum( map(str.isupper, txt) )
+
+            return ( upper, n - upper, 0, 0, 0, n - 1 )
+
+        upper = lower = numeric = punctuation = whitespace = leading = 0
+
+        for i, c in enumerate(txt):
+            cls = _ASCII_CLASS[c]
+
+            if cls == kernel.LOWER:
+                lower += 1
+                if leading == i:
+                    leading += 1
+            elif cls == kernel.UPPER:
+                upper += 1
+                if leading == i:
+                    leading += 1
+            elif cls == kernel.PUNCT:
+                if 0 < i < n - 1 and _ASCII_CLASS[txt[i-1]] == kernel.DIGIT and _ASCII_CLASS[txt[i+1]] == kernel.DIGIT:
+                    numeric += 1
+                else:
+                    punctuation += 1
+            elif cls == kernel.DIGIT:
+                numeric += 1
+            elif cls == kernel.SPACE:
+                whitespace += 1
+
+        return ( upper, lower, numeric, punctuation, whitespace, min(leading, n - 1) )
+
+    # a single pass maps every character to its class symbol, the
+    # counts are then done by str methods rather than per character
+    syms = txt.translate(_CLASS_TABLE)
+
+    embedded = 0
+    if "p" in syms:
+        embedded = len( _EMBEDDED_IN_NUMBER.findall(syms) )
+
+    return ( syms.count("U") + syms.count("u"),
+             syms.count("L") + syms.count("l"),
+             syms.count("d") + embedded,
+             syms.count("p") - embedded,
+             syms.count("s"),
+             # only prefixes shorter than the word are considered
+             min( n - len(syms.lstrip("ULA")), n - 1 ) )
+
+
 def word_classes(txt):
     """Return the number of characters in the word in each of the following classes
         - upper_case
@@ -122,31 +256,54 @@ def word_classes(txt):
     periods and commas that are embedded in numbers (i.e 10.3 or 123,456.78) are ONLY
     counted as numeric NOT punctuation
     """
-    winfo = WordInfo()
 
     if not txt:
-        return winfo
-
-    winfo.txt = txt
-
-    for i in range(len(txt)):
-        if txt[:i].isalpha():
-            winfo.leading_alphabetic = i
-        if txt[i].isupper():
-            winfo.upper_case = winfo.upper_case + 1
-        elif txt[i].islower():
-            winfo.lower_case = winfo.lower_case + 1
-        elif txt[i].isspace():
-            winfo.whitespace = winfo.whitespace + 1
-        elif txt[i].isdigit():
-            winfo.numeric = winfo.numeric + 1
-        elif txt[i] in string.punctuation:
-            if ( ( i > 0 ) and txt[i-1].isdigit() ) and ( ( i < len(txt)-1 ) and txt[i+1].isdigit() ) :
-                winfo.numeric = winfo.numeric + 1
-            else:
-                winfo.punctuation = winfo.punctuation + 1
+        return WordInfo()
+
+    return WordInfo(txt, *word_counts(txt))
+
+
+# building a pydantic adapter is far more expensive than using one
+_ADAPTERS = {
+    "int" : pydantic.TypeAdapter(int),
+    "float" : pydantic.TypeAdapter(float),
+    "bool" : pydantic.TypeAdapter(bool),
+}
+
+
+@functools.lru_cache(maxsize=8)
+def _load_font_map(path, mtime_ns, size) -> dict:
+    """Parsed font map, (re)read only when the file changes"""
+
+    with open( path, "r") as fonts:
+        return json.load(fonts)
+
+
+def parse_head_len_table(table : str) -> tuple:
+    """Parse "LEN:MAX,..." into sorted (word lengths, max head lengths)
+
+    Words of at least LEN characters have a head of at most MAX
+    characters, words shorter than the first LEN use its MAX
+    """
+
+    if not table:
+        return ((), ())
 
-    return winfo
+    entries = sorted( tuple( int(v) for v in entry.split(":") ) for entry in table.split(",") if entry.strip() )
+
+    for entry in entries:
+        if len(entry) != 2:
+            raise ValueError(f"head_len_table entry {':'.join(map(str, entry))} is not LEN:MAX")
+        if entry[1] < 1:
+            # a hashed head length is taken modulo MAX
+            raise ValueError(f"head_len_table MAX must be at least 1, not {entry[1]}")
+
+    return ( tuple( e[0] for e in entries ), tuple( e[1] for e in entries ) )
+
+
+# below this many words the fixed cost of the NumPy kernel outweighs
+# deciding each word individually
+_MIN_VECTOR_BATCH = 16
 
 
 class Rules:
@@ -157,6 +314,7 @@ class Rules:
         """
 
         self.font_map = {}
+        self.lexicon = Lexicon()
 
         for k,t in KEYS.items():
 
@@ -167,6 +325,10 @@ class Rules:
             else:
                 setattr(self, field, None)
 
+        self._decision_cache = DecisionCache(self._decision_cache_size)
+        self._head_len_limits = parse_head_len_table(self._head_len_table)
+        self._compileRules()
+
     def __str__(self):
 
         return pprint.pformat( {
@@ -176,25 +338,23 @@ class Rules:
     def loadRulesFromDict(self, cfg):
         """Reading the dict from external file is done by caller"""
 
-        try:
+        for k,v in cfg.items():
 
-            for k,v in cfg.items():
+            field = k.replace("policy.","").replace("-", "_")
 
-                key = k.replace("policy.","")
-                field = k.replace("policy.","").replace("-", "_")
+            if k not in KEYS:
+                continue
 
-                if k in KEYS:
-                    if KEYS[k]["type"] == "int":
-                        setattr(self, field, pydantic.parse_obj_as(int,cfg[k]))
-                    elif KEYS[k]["type"] == "float":
-                        setattr(self, field, pydantic.parse_obj_as(float,cfg[k]))
-                    elif KEYS[k]["type"] == "bool":
-                        setattr(self, field, pydantic.parse_obj_as(bool,cfg[k]))
-                    else:
-                        setattr(self, field, cfg[k] )
+            # a bad value keeps the current (default) one, and does not
+            # stop the remaining keys being loaded
+            try:
+                if KEYS[k]["type"] in _ADAPTERS:
+                    setattr(self, field, _ADAPTERS[ KEYS[k]["type"] ].validate_python(v))
+                else:
+                    setattr(self, field, v )
 
-        except Exception as e:
-            LOGGER.exception(e)
+            except Exception as e:
+                LOGGER.error(f"Ignoring {k}={v!r}, keeping {getattr(self, field)!r} : {e}")
 
     def saveRulesToDict(self, cfg):
         """Writing dict to file is handled in caller"""
@@ -212,54 +372,199 @@ class Rules:
             LOGGER.exception(e)
 
 
+    def compile(self) -> CompiledPolicy:
+        """Snapshot the current rules for use in the per-element hot path
+        (or to hand to worker processes)"""
+
+        fallback_fonts = dict( self.font_map.get(self.fallback_font, {}) )
+
+        fallback_italic_style = "Bold"
+        if "Bold Italic" in fallback_fonts:
+            fallback_italic_style = "Bold Italic"
+        if "BoldItalic" in fallback_fonts:
+            fallback_italic_style = "BoldItalic"
+
+        return CompiledPolicy(
+            use_strong_text = self.use_strong_text,
+            use_colored_text = self.use_colored_text,
+            use_strong_box = self.use_strong_box,
+            text_color = self.getColoredTextColor(),
+            text_rgb = color_to_rgb(self.colored_text_color),
+            strong_box_color = self.strong_box_color,
+            strong_box_rgb = color_to_rgb(self.strong_box_color),
+            strong_box_height = self.strong_box_height,
+            strong_box_shape = self.strong_box_shape,
+            box_x_scale = self.box_x_scale,
+            box_x_offset = self.box_x_offset,
+            box_y_scale = self.box_y_scale,
+            box_y_offset = self.box_y_offset,
+            modify_strong_font_size = self.modify_strong_font_size,
+            min_ocr_image_width = self.min_ocr_image_width,
+            min_ocr_image_height = self.min_ocr_image_height,
+            fallback_font = self.fallback_font,
+            font_map = self.font_map,
+            fallback_fonts = fallback_fonts,
+            fallback_italic_style = fallback_italic_style,
+        )
+
     def shouldAugment(self, word, words_in_line=0, lines_in_para=0 ) -> bool :
         """Returns if 'word' should be marked up
         (taking into account letters, numbers, etc)
 
         Advanced context (words_in_line/lines_in_para) improve model
         """
-        ret = False
+        ret = self._decideOne(word, words_in_line, lines_in_para)
+
+        LOGGER.debug(f"Augment '{word}' ? {ret} | {words_in_line} {lines_in_para}")
+        return ret
+
+    def _decideOne(self, word, words_in_line, lines_in_para) -> bool :
+        """shouldAugment() via the decision cache"""
 
-        cls = word_classes(word)
+        # there is nothing to split in an empty word, whatever the rules say
+        if not word or ( self.lexicon and word in self.lexicon ):
+            return False
 
+        key = None
+
+        if self.decision_cache.enabled:
+            if self._pipeline.raw_context:
+                key = ( word, words_in_line, lines_in_para )
+            else:
+                key = ( word,
+                        0 < words_in_line < self.min_words_in_line,
+                        0 < lines_in_para < self.min_lines_in_para )
 
-        if cls.leading_alphabetic == 0:
-            # Does not start with letter -> False
-            ret = False
-        elif  cls.upper_case > 0 and cls.lower_case == 0 and cls.numeric > 0:
-            # Only upper-case letters and numbers -> False
-            # probably an ID of some sort
-            ret = False
+            ret = self.decision_cache.get(key)
+            if ret is not None:
+                return ret
+
+        # the compiled rules, called directly as this is per word
+        ret = self._pipeline.scalar( word, *word_counts(word), len(word), words_in_line, lines_in_para )
+
+        if key is not None:
+            self.decision_cache.put(key, ret)
+
+        return ret
+
+    def evaluate_many(self, words, words_in_line=0, lines_in_para=0, key=None, keys=None) -> WordDecisions :
+        """Batch equivalent of shouldAugment() followed by splitWord()
+
+        `words_in_line`/`lines_in_para` are either a single value for all
+        words or a sequence with one value per word.
+
+        `key` identifies where the batch is in the document, each word is
+        split using (key, index in batch) as its occurrence key - unless
+        `keys` gives one occurrence key per word (i.e. the key splitWord()
+        is called with for the word on its own)
+
+        Returns boolean `augment` and integer `head_len` arrays (head_len
+        is 0 for words that are not augmented)
+        """
+
+        if len(words) < _MIN_VECTOR_BATCH:
+
+            if np.ndim(words_in_line) == 0:
+                words_in_line = [ words_in_line ] * len(words)
+            if np.ndim(lines_in_para) == 0:
+                lines_in_para = [ lines_in_para ] * len(words)
+
+            augment = np.fromiter( map(self._decideOne, words, words_in_line, lines_in_para),
+                                  dtype=bool, count=len(words) )
 
         else:
-            if ( cls.upper_case + cls.lower_case ) > cls.numeric:
-                # More letters than numbers -> True
-                ret = True
+            words_in_line = np.broadcast_to( np.asarray(words_in_line), (len(words),) )
+            lines_in_para = np.broadcast_to( np.asarray(lines_in_para), (len(words),) )
+
+            # empty and listed words are skipped without being classified
+            todo = None
+            if self.lexicon:
+                todo = np.flatnonzero( [ word != "" and word not in self.lexicon for word in words ] )
+            elif "" in words:
+                todo = np.flatnonzero( [ word != "" for word in words ] )
+
+            if todo is None or len(todo) == len(words):
+                augment = self._augmentMany(words, words_in_line, lines_in_para)
+            else:
+                augment = np.zeros( len(words), dtype=bool)
+                if len(todo):
+                    augment[todo] = self._augmentMany( [ words[idx] for idx in todo.tolist() ],
+                                                      words_in_line[todo], lines_in_para[todo] )
+
+        head_len = np.zeros( len(words), dtype=np.int64)
 
-            if ( cls.upper_case + cls.lower_case ) > cls.whitespace:
-                # More letters than whitespace -> True
-                ret = True
+        hashed = self.split_mode == "hashed"
+
+        # in "random" mode this draws in the same order as per-word splitWord() calls
+        for idx in np.flatnonzero(augment).tolist():
+            if not hashed:
+                occurrence = None
+            elif keys is not None:
+                occurrence = keys[idx]
             else:
-                ret = False
+                occurrence = f"{key}:{idx}"
+
+            head_len[idx] = self.headLength(words[idx], key=occurrence)
 
-            if ( cls.upper_case + cls.lower_case ) > cls.punctuation:
-                # More letters than punctuation -> True
-                ret = True
+        LOGGER.debug(f"Augment {int(augment.sum())} of {len(words)} words")
+
+        return WordDecisions( augment=augment, head_len=head_len)
+
+    def _augmentMany(self, words, words_in_line, lines_in_para):
+        """Vectorised shouldAugment() over `words` via the decision cache
+        (the context arguments are arrays of len(words))"""
+
+        if self.decision_cache.enabled:
+
+            if self._pipeline.raw_context:
+                keys = list( zip(words, words_in_line.tolist(), lines_in_para.tolist()) )
             else:
-                ret = False
+                short_line = ( ( words_in_line > 0 ) & ( words_in_line < self.min_words_in_line ) ).tolist()
+                short_para = ( ( lines_in_para > 0 ) & ( lines_in_para < self.min_lines_in_para ) ).tolist()
 
-        # the above only look at the characters in a word, now look at
-        # context (overriding any Trues above)
+                keys = list( zip(words, short_line, short_para) )
+            decided = self.decision_cache.get_many(keys)
 
-        if words_in_line > 0 and words_in_line < self.min_words_in_line:
-            ret = False
+            missing = [ idx for idx, d in enumerate(decided) if d is None ]
 
-        if lines_in_para > 0 and lines_in_para < self.min_lines_in_para:
-            ret = False
+            if missing:
+                computed = self._decideMany( [ words[idx] for idx in missing ],
+                                            words_in_line[missing], lines_in_para[missing] )
 
-        # All other combinations not marked up
-        LOGGER.debug(f"Augment '{word}' ? {ret} | {cls} {words_in_line} {lines_in_para}")
-        return ret
+                for idx, d in zip(missing, computed.tolist()):
+                    decided[idx] = d
+                    self.decision_cache.put(keys[idx], d)
+
+            augment = np.array( decided, dtype=bool)
+
+        else:
+            augment = self._decideMany(words, words_in_line, lines_in_para)
+
+        return augment
+
+    def _decideMany(self, words, words_in_line, lines_in_para):
+        """Uncached, vectorised shouldAugment() over `words`"""
+
+        counts, leading, lengths = kernel.classify(words)
+
+        return self._pipeline.vector( words, counts[:, kernel.UPPER], counts[:, kernel.LOWER],
+                                     counts[:, kernel.DIGIT], counts[:, kernel.PUNCT],
+                                     counts[:, kernel.SPACE], leading, lengths,
+                                     words_in_line, lines_in_para )
+
+    def _compileRules(self):
+        """(Re)compile `rules` with the current thresholds"""
+
+        self._pipeline = self._newPipeline(self._rules)
+
+    def _newPipeline(self, rules, **thresholds) -> Pipeline :
+        """Compile `rules` with the current thresholds, or those given"""
+
+        return Pipeline( rules, {
+            "min_words_in_line" : self._min_words_in_line,
+            "min_lines_in_para" : self._min_lines_in_para,
+            **thresholds,
+        })
 
     def getStrongFontPath(self, base_font_name : str, italic : bool, size : int) -> str:
         """Returns the path to the _strong_ version of base_font_name from the font-map
@@ -322,17 +627,51 @@ class Rules:
         else:
             return ""
 
-    def splitWord(self, word) -> WordDetails:
+    def splitWord(self, word, key=None) -> WordDetails:
         """Split a word according to the policy `rules`"""
 
-        head_size = 0
-        if len(word) > self.max_head_len:
-            head_size = random.randint(1, self.max_head_len) # nosec: B311
-        else:
-            head_size = random.randint(1, len(word)) # nosec: B311
+        head_size = self.headLength(word, key=key)
 
         return WordDetails( head = word[:head_size], tail = word[head_size:])
 
+    def maxHeadLength(self, length : int) -> int:
+        """Longest head allowed for a word of `length` characters"""
+
+        lengths, limits = self._head_len_limits
+
+        if not lengths:
+            return self.max_head_len
+
+        return limits[ max( bisect.bisect_right(lengths, length) - 1, 0 ) ]
+
+    def headLength(self, word, key=None) -> int:
+        """Number of characters in the head of `word`
+
+        In "hashed" split_mode this is a pure function of (seed, word, key)
+        so any part of a document can be processed independently (and
+        in any order) and still match a serial run; `key` should identify
+        the occurrence of the word (i.e. page and position).
+
+        In "random" mode it is drawn from the (seeded) global `random`
+
+        An empty word has no head (0)
+        """
+
+        limit = min( len(word), self.maxHeadLength(len(word)) )
+
+        if limit <= 0:
+            return 0
+
+        if self.split_mode == "hashed":
+
+            digest = hashlib.blake2b( f"{key}\0{word}".encode("utf-8", "surrogatepass"),
+                                     digest_size=8,
+                                     key=str(self.seed).encode() ).digest()
+
+            return 1 + int.from_bytes(digest, "little") % limit
+
+        return random.randint(1, limit) # nosec: B311
+
 
     @property
     def font_map(self):
@@ -346,7 +685,8 @@ class Rules:
 
     @property
     def font_map_file(self):
-        """Map font names to font files"""
+        """Map font names to font files, either a font index (from
+        map-fonts) or a JSON font map"""
         return self._font_map_file
 
     @font_map_file.setter
@@ -355,9 +695,27 @@ class Rules:
 
         if value is None:
             self.font_map = {}
+        elif is_font_index(self._font_map_file):
+            # queried per family as required
+            self.font_map = FontIndex(self._font_map_file)
         else:
-            with open( self._font_map_file, "r") as fonts:
-                self.font_map = json.load(fonts)
+            st = os.stat(self._font_map_file)
+            self.font_map = _load_font_map(self._font_map_file, st.st_mtime_ns, st.st_size)
+
+    @property
+    def decision_cache(self):
+        """LRU cache of shouldAugment() decisions"""
+        return self._decision_cache
+
+    @property
+    def decision_cache_size(self):
+        """Maximum number of cached decisions (0 to disable)"""
+        return self._decision_cache_size
+
+    @decision_cache_size.setter
+    def decision_cache_size(self, value):
+        self._decision_cache_size = value
+        self._decision_cache = DecisionCache(value)
 
     @property
     def fallback_font(self):
@@ -380,9 +738,8 @@ class Rules:
 
     @property
     def max_head_len(self):
-        """Minimum number of characters of 'head' segment
-        TODO
-        - a constant feels wrong - should be based on length of word?
+        """Maximum number of characters of 'head' segment
+        (see head_len_table for a limit based on the length of word)
         """
         return self._max_head_len
 
@@ -390,6 +747,27 @@ class Rules:
     def max_head_len(self, value):
         self._max_head_len = value
 
+    @property
+    def head_len_table(self):
+        """Per word-length maximum head lengths, "LEN:MAX,..." (overrides max_head_len)"""
+        return self._head_len_table
+
+    @head_len_table.setter
+    def head_len_table(self, value):
+        self._head_len_limits = parse_head_len_table(value)
+        self._head_len_table = value
+
+    @property
+    def split_mode(self):
+        """How head lengths are chosen, "random" or "hashed" (order independent)"""
+        return self._split_mode
+
+    @split_mode.setter
+    def split_mode(self, value):
+        if value not in ["random", "hashed"]:
+            raise ValueError(f"Unknown split_mode '{value}'")
+        self._split_mode = value
+
     @property
     def modify_strong_font_size(self):
         """Shoehorning bold chars into limited space can
@@ -450,7 +828,7 @@ class Rules:
 
     @use_strong_text.setter
     def use_strong_text(self, value):
-        self._use_strong_text = pydantic.parse_obj_as(bool,value)
+        self._use_strong_text = _ADAPTERS["bool"].validate_python(value)
 
     @property
     def use_strong_box(self):
@@ -458,7 +836,7 @@ class Rules:
 
     @use_strong_box.setter
     def use_strong_box(self, value):
-        self._use_strong_box = pydantic.parse_obj_as(bool,value)
+        self._use_strong_box = _ADAPTERS["bool"].validate_python(value)
 
     @property
     def use_colored_text(self):
@@ -466,7 +844,7 @@ class Rules:
 
     @use_colored_text.setter
     def use_colored_text(self, value):
-        self._use_colored_text = pydantic.parse_obj_as(bool,value)
+        self._use_colored_text = _ADAPTERS["bool"].validate_python(value)
 
     @property
     def min_words_in_line(self):
@@ -474,7 +852,10 @@ class Rules:
 
     @min_words_in_line.setter
     def min_words_in_line(self, value):
+        # only replace the threshold if the rules compile with it
+        self._pipeline = self._newPipeline(self._rules, min_words_in_line=value)
         self._min_words_in_line = value
+        self.decision_cache.clear()
 
     @property
     def min_lines_in_para(self):
@@ -482,7 +863,38 @@ class Rules:
 
     @min_lines_in_para.setter
     def min_lines_in_para(self, value):
+        # only replace the threshold if the rules compile with it
+        self._pipeline = self._newPipeline(self._rules, min_lines_in_para=value)
         self._min_lines_in_para = value
+        self.decision_cache.clear()
+
+    @property
+    def rules(self):
+        """Ordered "augment if EXPR"/"skip if EXPR" rules (see randeli.policy.pipeline)"""
+        return self._rules
+
+    @rules.setter
+    def rules(self, value):
+        rules = parse_rules(value)
+        # only replace the current rules if the new ones compile
+        self._pipeline = self._newPipeline(rules)
+        self._rules = rules
+        self.decision_cache.clear()
+
+    @property
+    def lexicons(self):
+        """Word list files (see randeli.policy.lexicon), listed words are never augmented"""
+        return self._lexicons
+
+    @lexicons.setter
+    def lexicons(self, value):
+        paths = parse_lexicons(value)
+        self.lexicon = Lexicon.merge( load_lexicon(path) for path in paths )
+        self._lexicons = paths
+        self.decision_cache.clear()
+
+        if paths:
+            LOGGER.info(f"Loaded {len(self.lexicon)} lexicon entries from {', '.join(paths)}")
 
     @property
     def box_x_scale(self):
@@ -10,7 +10,7 @@ FONTMAP=$(randeli config get --key=policy.font-map-file)
 
 if [ ! -r "${FONTMAP}" ]
 then
-    echo "Missing fonts.json. Have you generated it ? (i.e. randeli map-fonts)"
+    echo "Missing font index ${FONTMAP:-fonts.db}. Have you generated it ? (i.e. randeli map-fonts)"
     exit 1
 fi
 
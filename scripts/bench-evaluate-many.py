@@ -0,0 +1,68 @@
+#! /usr/bin/env python3
+#
+# Words/sec deciding and splitting words one at a time, as the handlers
+# did before the batch API (the original code, scripts/reference_policy.py,
+# and today's shouldAugment()/splitWord()), against Rules.evaluate_many()
+#
+#   python scripts/bench-evaluate-many.py [--repeat N] [--batch N] [TEXT...]
+
+import argparse
+import functools
+import pathlib
+import timeit
+
+import reference_policy as reference
+from loguru import logger
+
+from randeli.policy.rules import Rules
+
+TOPDIR = pathlib.Path(__file__).parent.parent
+
+
+def per_word(should_augment, split, words):
+
+    for word in words:
+        if should_augment(word, 7, 2):
+            split(word)
+
+
+def batched(evaluate_many, batches):
+
+    for batch in batches:
+        evaluate_many(batch, words_in_line=7, lines_in_para=2)
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=200, help="words per evaluate_many() call (i.e. a paragraph)")
+    parser.add_argument("text", nargs="*", default=[ str(TOPDIR / "README.md") ])
+    args = parser.parse_args()
+
+    logger.disable("randeli")
+
+    words = [ w for path in args.text for w in pathlib.Path(path).read_text(encoding="utf-8").split() ] * 20
+
+    batches = [ words[i:i + args.batch] for i in range(0, len(words), args.batch) ]
+
+    print(f"{len(words)} words, in batches of {args.batch}")
+
+    for cache_size in ( 0, 8192 ):
+
+        rules = Rules()
+        rules.decision_cache_size = cache_size
+
+        timings = {
+            "original per-word" : ( per_word, reference.should_augment, reference.head_length, words ),
+            "per-word" : ( per_word, rules.shouldAugment, rules.splitWord, words ),
+            "evaluate_many" : ( batched, rules.evaluate_many, batches ),
+        }
+
+        for name, ( func, *func_args ) in timings.items():
+            best = min(timeit.repeat(functools.partial(func, *func_args), number=1, repeat=args.repeat))
+            print(f"{name:>18} (cache {cache_size:4}): {len(words) / best:12,.0f} words/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#! /usr/bin/env python3
+#
+# Time and output size of augmenting a PDF with and without the
+# per-document strong font cache, and the handler's text style cache
+# (requires the Apryse SDK)
+#
+#   python scripts/bench-font-cache.py --token TOKEN --font-map-file FILE [PDF]
+
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+
+from randeli.cmds.handlers.augment import PDFEventHandler
+from randeli.librandeli.backend import Apryse
+
+TOPDIR = pathlib.Path(__file__).parent.parent
+
+
+def augment(pdf, out, token, font_map_file, font_cache):
+
+    ctx = {
+        "ocr.enabled" : False,
+        "ocr.forced" : False,
+        "ocr.mode" : "page",
+        "write" : str(out),
+        "augment.write-into" : "",
+        "policy.font-map-file" : font_map_file,
+    }
+
+    options = {
+        "apryse-token" : token,
+        "write-into" : "",
+        "font-cache" : font_cache,
+    }
+
+    start = time.perf_counter()
+
+    backend = Apryse(options)
+
+    handler = PDFEventHandler(ctx=ctx, backend=backend)
+
+    if not font_cache:
+        # the handler's own (font path, size) style cache would still
+        # create each strong font only once, so without the font cache a
+        # style - and so a font - is created for every word, as before
+        # either cache existed
+        def uncached_style(font_path, font_size):
+            handler.text_styles.clear()
+            return PDFEventHandler.textStyle(handler, font_path, font_size)
+
+        handler.textStyle = uncached_style
+
+    # as augment sets up the backend
+    backend.options["augment-types"] = handler.augmentTypes()
+    backend.options["element-types"] = handler.elementTypes()
+    backend.options["page-batch"] = "text" in backend.options["element-types"]
+
+    backend.notificationCenter().subscribe("OpenDocument", handler.openDocumentCB)
+    backend.notificationCenter().subscribe("BeginPage", handler.beginPageCB)
+    backend.notificationCenter().subscribe("EndPage", handler.endPageCB)
+    backend.notificationCenter().subscribe("ProcessPage", handler.processPageCB)
+    backend.notificationCenter().subscribe("ProcessElement", handler.elementCB)
+
+    backend.loadDocument(str(pdf))
+    backend.processDocument( read_only=False )
+    backend.saveDocument( filename=str(out) )
+
+    elapsed = time.perf_counter() - start
+
+    backend.finalise()
+
+    return elapsed, os.path.getsize(out)
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--token", default=os.environ.get("APRYSE_TOKEN", ""))
+    parser.add_argument("--font-map-file", required=True)
+    parser.add_argument("pdf", nargs="?", default=str(TOPDIR / "samples" / "pdflatex" / "paragraph.pdf"))
+    args = parser.parse_args()
+
+    print(f"{args.pdf}: {os.path.getsize(args.pdf)} bytes")
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        for font_cache in ( False, True ):
+
+            elapsed, size = augment(args.pdf, pathlib.Path(tmp, f"out-{font_cache}.pdf"),
+                                    args.token, args.font_map_file, font_cache)
+
+            print(f"font-cache={str(font_cache):<5}: {elapsed:7.3f}s {size:>10} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#! /usr/bin/env python3
+#
+# Time reading font names (as map-fonts does) over a generated font directory
+#
+#   python scripts/bench-map-fonts.py [--fonts N] [--glyphs N] [--jobs N]
+
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+
+from fontTools import ttLib
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+STYLES = ( "Regular", "Bold", "Italic", "Bold Italic" )
+
+
+def make_font(path, family, style, glyphs):
+
+    names = [ ".notdef" ] + [ f"g{i}" for i in range(glyphs) ]
+
+    pen = TTGlyphPen(None)
+    pen.moveTo((0, 0))
+    pen.lineTo((0, 500))
+    pen.lineTo((500, 500))
+    pen.closePath()
+    glyph = pen.glyph()
+
+    fb = FontBuilder(1000, isTTF=True)
+    fb.setupGlyphOrder(names)
+    fb.setupCharacterMap( { 0x4E00 + i: f"g{i}" for i in range(glyphs) } )
+    fb.setupGlyf( { name: glyph for name in names } )
+    fb.setupHorizontalMetrics( { name: (500, 0) for name in names } )
+    fb.setupHorizontalHeader(ascent=800, descent=-200)
+    fb.setupNameTable( { "familyName": family, "styleName": style } )
+    fb.setupOS2()
+    fb.setupPost()
+    fb.save(path)
+
+
+def generate(top, count, glyphs):
+
+    base = str(pathlib.Path(top, "base.ttf"))
+    make_font(base, "Base", "Regular", glyphs)
+
+    for i in range(count):
+        sub = pathlib.Path(top, f"family{i // 40}")
+        sub.mkdir(exist_ok=True)
+
+        # only the name table is rebuilt, the rest is copied as is
+        font = ttLib.TTFont(base, lazy=True)
+        font['name'].setName(f"Bench Sans {i // 4}", 1, 3, 1, 0x409)
+        font['name'].setName(STYLES[i % 4], 2, 3, 1, 0x409)
+        font.save( str(sub / f"Bench{i}.ttf") )
+
+    os.remove(base)
+
+    # and a collection
+    fonts = [ ttLib.TTFont( str(p) ) for p in sorted(pathlib.Path(top).glob("family0/*.ttf"))[:4] ]
+    collection = ttLib.TTCollection()
+    collection.fonts = fonts
+    collection.save( str(pathlib.Path(top, "Bench.ttc")) )
+
+
+def font_files(top):
+    return sorted( str(p) for p in pathlib.Path(top).rglob("*") if p.suffix in ( ".ttf", ".ttc" ) )
+
+
+def legacy(files):
+    """The original map-fonts loop"""
+
+    names = []
+    for path in files:
+        try:
+            font_list = [ ttLib.TTFont(path) ]
+        except ttLib.TTLibFileIsCollectionError:
+            font_list = ttLib.TTCollection(path)
+
+        names.append( [ ( str( f['name'].getDebugName(1) ), str( f['name'].getDebugName(2) ) ) for f in font_list ] )
+
+    return names
+
+
+def timed(label, func, *args):
+
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+
+    print(f"{label:>24}: {elapsed:7.3f}s")
+
+    return result
+
+
+def main():
+
+    # importing map-fonts needs the module name with the hyphen
+    map_fonts = __import__("randeli.cmds.map-fonts", None, None, ["read_all_font_names"])
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fonts", type=int, default=400)
+    parser.add_argument("--glyphs", type=int, default=4000)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as top:
+
+        timed(f"generate {args.fonts} fonts", generate, top, args.fonts, args.glyphs)
+
+        files = font_files(top)
+
+        expected = timed("legacy TTFont", legacy, files)
+
+        assert timed("name table, 1 job", map_fonts.read_all_font_names, files, 1) == expected
+        assert timed(f"name table, {args.jobs} jobs", map_fonts.read_all_font_names, files, args.jobs) == expected
+
+
+if __name__ == "__main__":
+    main()
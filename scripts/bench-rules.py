@@ -0,0 +1,112 @@
+#! /usr/bin/env python3
+#
+# Compare the compiled policy rules (randeli/policy/pipeline.py) with the
+# hard-coded shouldAugment() chain they replaced, for the same classified
+# words - checking they decide every word the same, and timing both
+#
+#   python scripts/bench-rules.py [--repeat N] [TEXT...]
+
+import argparse
+import pathlib
+import timeit
+
+import numpy as np
+from loguru import logger
+
+from randeli.policy.rules import Rules, word_classes
+
+TOPDIR = pathlib.Path(__file__).parent.parent
+
+
+def legacy(cls, words_in_line, lines_in_para, min_words_in_line, min_lines_in_para):
+    """shouldAugment() before the rule pipeline (less the classification)"""
+
+    ret = False
+
+    if cls.leading_alphabetic == 0:
+        ret = False
+    elif  cls.upper_case > 0 and cls.lower_case == 0 and cls.numeric > 0:
+        ret = False
+    else:
+        if ( cls.upper_case + cls.lower_case ) > cls.numeric:
+            ret = True
+
+        if ( cls.upper_case + cls.lower_case ) > cls.whitespace:
+            ret = True
+        else:
+            ret = False
+
+        if ( cls.upper_case + cls.lower_case ) > cls.punctuation:
+            ret = True
+        else:
+            ret = False
+
+    if words_in_line > 0 and words_in_line < min_words_in_line:
+        ret = False
+
+    if lines_in_para > 0 and lines_in_para < min_lines_in_para:
+        ret = False
+
+    return ret
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("text", nargs="*", default=[ str(TOPDIR / "README.md") ])
+    args = parser.parse_args()
+
+    logger.disable("randeli")
+
+    words = [ w for path in args.text for w in pathlib.Path(path).read_text(encoding="utf-8").split() ] * 20
+
+    rng = np.random.default_rng(1)
+    words_in_line = rng.integers(0, 12, len(words)).tolist()
+    lines_in_para = rng.integers(0, 4, len(words)).tolist()
+
+    rules = Rules()
+    rules.decision_cache_size = 0
+
+    classes = [ word_classes(w) for w in words ]
+    context = list(zip(classes, words_in_line, lines_in_para))
+
+    minw = rules.min_words_in_line
+    minl = rules.min_lines_in_para
+
+    expected = [ legacy(c, w, l, minw, minl) for c, w, l in context ]
+    compiled = [ rules._decideOne(w, wl, lp) for w, wl, lp in zip(words, words_in_line, lines_in_para) ]
+    batch = rules._decideMany(words, np.array(words_in_line), np.array(lines_in_para)).tolist()
+
+    if compiled != expected or batch != expected:
+        raise SystemExit("compiled rules decide differently to the hard-coded chain")
+
+    scalar = rules._pipeline.scalar
+    vector = rules._pipeline.vector
+
+    counts = [ ( c.txt, c.upper_case, c.lower_case, c.numeric, c.punctuation, c.whitespace,
+                 c.leading_alphabetic, len(c.txt), w, l ) for c, w, l in context ]
+
+    arrays = [ np.array(words, dtype=object) ] + [ np.array(a) for a in list(zip(*counts))[1:] ]
+
+    timings = {
+        # the rules alone, over already classified words
+        "hard-coded" : lambda: [ legacy(c, w, l, minw, minl) for c, w, l in context ],
+        "compiled" : lambda: [ scalar(*a) for a in counts ],
+        "compiled (vector)" : lambda: vector(*arrays),
+        # as shouldAugment() uses them (less its debug logging)
+        "classify + hard-coded" : lambda: [ legacy(word_classes(w), wl, lp, minw, minl)
+                                                       for w, wl, lp in zip(words, words_in_line, lines_in_para) ],
+        "shouldAugment (uncached)" : lambda: [ rules._decideOne(w, wl, lp)
+                                               for w, wl, lp in zip(words, words_in_line, lines_in_para) ],
+    }
+
+    print(f"{len(words)} words, {sum(expected)} augmented, decisions identical")
+
+    for name, func in timings.items():
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        print(f"{name:>24}: {len(words) / best:14,.0f} words/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#! /usr/bin/env python3
+#
+# Time saving an augmented PDF in each --save-mode, and the size of the
+# result (requires the Apryse SDK)
+#
+#   python scripts/bench-save-modes.py --token TOKEN --font-map-file FILE [PDF...]
+
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+
+from randeli.cmds.handlers.augment import PDFEventHandler
+from randeli.librandeli.backend import Apryse
+from randeli.librandeli.backend.apryse import SAVE_MODES
+
+TOPDIR = pathlib.Path(__file__).parent.parent
+
+
+def augmented(pdf, token, font_map_file, save_mode):
+    """Backend holding `pdf` augmented (but not yet saved)"""
+
+    ctx = {
+        "ocr.enabled" : False,
+        "ocr.forced" : False,
+        "ocr.mode" : "page",
+        "write" : "",
+        "augment.write-into" : "",
+        "policy.font-map-file" : font_map_file,
+    }
+
+    options = {
+        "apryse-token" : token,
+        "write-into" : "",
+        "save-mode" : save_mode,
+    }
+
+    backend = Apryse(options)
+
+    handler = PDFEventHandler(ctx=ctx, backend=backend)
+
+    # as augment sets up the backend, so the document saved is the one
+    # augment would save (untouched pages left as is)
+    backend.options["augment-types"] = handler.augmentTypes()
+    backend.options["element-types"] = handler.elementTypes()
+    backend.options["page-batch"] = "text" in backend.options["element-types"]
+
+    backend.notificationCenter().subscribe("OpenDocument", handler.openDocumentCB)
+    backend.notificationCenter().subscribe("BeginPage", handler.beginPageCB)
+    backend.notificationCenter().subscribe("EndPage", handler.endPageCB)
+    backend.notificationCenter().subscribe("ProcessPage", handler.processPageCB)
+    backend.notificationCenter().subscribe("ProcessElement", handler.elementCB)
+
+    backend.loadDocument(str(pdf))
+    backend.processDocument( read_only=False, overlay=handler.overlayOnly() )
+
+    return backend
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--token", default=os.environ.get("APRYSE_TOKEN", ""))
+    parser.add_argument("--font-map-file", required=True)
+    parser.add_argument("pdf", nargs="*")
+    args = parser.parse_args()
+
+    pdfs = args.pdf or sorted( str(p) for p in TOPDIR.glob("samples/*/*.pdf") )
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        for pdf in pdfs:
+
+            print(f"{pdf}: {os.path.getsize(pdf)} bytes")
+
+            for save_mode in SAVE_MODES:
+
+                out = pathlib.Path(tmp, f"{save_mode}.pdf")
+
+                backend = augmented(pdf, args.token, args.font_map_file, save_mode)
+
+                start = time.perf_counter()
+                backend.saveDocument( filename=str(out) )
+                elapsed = time.perf_counter() - start
+
+                backend.finalise()
+
+                print(f"  {save_mode:<12}: {elapsed:7.3f}s {os.path.getsize(out):>10} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#! /usr/bin/env python3
+#
+# Time classifying words of increasing length (i.e. URLs, DOIs, chemical
+# names or OCR runs without spaces) with the original per-character
+# word_classes() (scripts/reference_policy.py), today's word_classes(),
+# the word_counts() that shouldAugment() uses and the NumPy kernel used
+# by evaluate_many()
+#
+#   python scripts/bench-word-classes.py [--words N] [--repeat N] [--lengths N,...]
+
+import argparse
+import functools
+import random
+import string
+import timeit
+
+import reference_policy as reference
+
+from randeli.policy import kernel
+from randeli.policy.rules import word_classes, word_counts
+
+CHARS = string.ascii_letters + string.digits + "./:-()_,"
+
+
+def classify_each(classify, words):
+    return [ classify(w) for w in words ]
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, default=200, help="words per length bucket")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--lengths", default="4,16,64,256,1024")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+
+    # build the lookup table outside the timings
+    kernel.bmp_table()
+
+    print(f"{'length':>6} {'original':>12} {'word_classes':>14} {'word_counts':>13} {'kernel':>10}   (us per word)")
+
+    for length in ( int(n) for n in args.lengths.split(",") ):
+
+        words = [ "".join( rng.choice(CHARS) for _ in range(length) ) for _ in range(args.words) ]
+
+        timings = [ min(timeit.repeat(func, number=1, repeat=args.repeat)) for func in (
+            functools.partial(classify_each, reference.word_classes, words),
+            functools.partial(classify_each, word_classes, words),
+            functools.partial(classify_each, word_counts, words),
+            functools.partial(kernel.classify, words),
+        ) ]
+
+        original, table, counts, vector = ( 1e6 * t / len(words) for t in timings )
+
+        print(f"{length:>6} {original:>12.1f} {table:>14.1f} {counts:>13.1f} {vector:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#! /usr/bin/env python3
+#
+# Seeded property checks of the policy against the original per-word
+# implementation (scripts/reference_policy.py)
+#
+#   - word_classes() and the NumPy kernel classify every word as the
+#     original word_classes() did
+#   - in "random" split_mode evaluate_many() makes the same decisions,
+#     and the same head length draws in the same order, as calling the
+#     original shouldAugment()/splitWord() word by word
+#   - rules dividing by a count decide words where it is zero (as 0) the
+#     same one word at a time as in vectorised batches
+#   - rules combining counts with and/or/not decide words the same one
+#     word at a time as in vectorised batches, and and/or used as a number
+#     is rejected (Python's and/or give an operand, NumPy's a boolean)
+#   - empty words are never augmented, even by a rule that matches them
+#   - in "hashed" split_mode evaluate_many() with per-word keys splits
+#     words as splitWord() does with the same keys
+#
+#   python scripts/check-policy.py [--seed N] [--words N] [--trials N]
+
+import argparse
+import random
+import string
+
+import numpy as np
+import reference_policy as reference
+from loguru import logger
+
+from randeli.policy import kernel
+from randeli.policy.pipeline import RuleError
+from randeli.policy.rules import Rules, WordDetails, word_classes
+
+ALPHABET = string.ascii_letters + string.digits + string.punctuation + " \t" \
+    + "éßÆΩжこ٣²—’" + "\U0001D400\U0001F600" + ".,.,1212"
+
+FIELDS = ( "txt", "upper_case", "lower_case", "numeric", "punctuation", "whitespace", "leading_alphabetic" )
+
+
+def random_word(rng, longest=12):
+    return "".join( rng.choice(ALPHABET) for _ in range(rng.randint(0, longest)) )
+
+
+def info(winfo):
+    return tuple( getattr(winfo, f) for f in FIELDS )
+
+
+def check_classifier(rng, count):
+
+    words = [ random_word(rng, rng.choice( ( 4, 12, 64 ) )) for _ in range(count) ]
+    words += [ "", "a", "US8539484", "10.3", "123,456.78", "a,b", "1,2", "x.1", "1.", ".1",
+               "https://doi.org/10.1000/182", "2-(acetyloxy)benzoic" ]
+
+    counts, leading, lengths = kernel.classify(words)
+
+    for idx, word in enumerate(words):
+
+        expected = reference.word_classes(word)
+
+        if info(word_classes(word)) != info(expected):
+            raise SystemExit(f"word_classes({word!r}) = {word_classes(word)}, expected {expected}")
+
+        got = ( int(counts[idx, kernel.UPPER]), int(counts[idx, kernel.LOWER]), int(counts[idx, kernel.DIGIT]),
+                int(counts[idx, kernel.PUNCT]), int(counts[idx, kernel.SPACE]), int(leading[idx]) )
+
+        if got != info(expected)[1:] or lengths[idx] != len(word):
+            raise SystemExit(f"kernel.classify([{word!r}]) = {got}, expected {info(expected)[1:]}")
+
+    print(f"classifier: {len(words)} words identical")
+
+
+def check_random_mode(rng, trials):
+
+    for cache_size in ( 0, 8192, 5 ):
+
+        rules = Rules()
+        rules.decision_cache_size = cache_size
+
+        for trial in range(trials):
+
+            # both sides of the per-word/vectorised cutover
+            words = [ random_word(rng) for _ in range(rng.choice( ( 3, 40 ) )) ]
+            words_in_line = [ rng.randint(0, 8) for _ in words ]
+            lines_in_para = rng.randint(0, 3)
+
+            random.seed(trial)
+
+            expected = []
+            for word, wil in zip(words, words_in_line):
+                if reference.should_augment(word, wil, lines_in_para):
+                    expected.append( ( True, reference.head_length(word) ) )
+                else:
+                    expected.append( ( False, 0 ) )
+
+            random.seed(trial)
+
+            # split in two, the draws must continue across batches
+            split = rng.randint(0, len(words))
+            got = []
+            for part in ( slice(0, split), slice(split, None) ):
+                decisions = rules.evaluate_many(words[part], words_in_line=words_in_line[part],
+                                                lines_in_para=lines_in_para)
+                got += zip( decisions.augment.tolist(), decisions.head_len.tolist() )
+
+            if got != expected:
+                raise SystemExit(f"evaluate_many({words!r}, {words_in_line}, {lines_in_para}) = {got}, expected {expected}")
+
+        print(f"random mode: {trials} batches identical (decision cache size {cache_size})")
+
+
+DIVIDING_RULES = (
+    "augment if letters / punctuation > 2",
+    "skip if matches(\"[.]\") and length % numeric == 1",
+    "augment if whitespace / (numeric - 1) < 1 and leading_alphabetic > 0",
+)
+
+
+def check_division(rng, count):
+
+    rules = Rules()
+    rules.decision_cache_size = 0
+    rules.rules = DIVIDING_RULES
+
+    words = [ random_word(rng) for _ in range(count) ]
+    words_in_line = [ rng.randint(0, 8) for _ in words ]
+
+    scalar = [ rules._decideOne(w, wil, 0) for w, wil in zip(words, words_in_line) ]
+    vector = rules._decideMany(words, np.array(words_in_line), np.zeros(len(words), dtype=int)).tolist()
+
+    if scalar != vector:
+        idx = next( i for i, ( a, b ) in enumerate(zip(scalar, vector)) if a != b )
+        raise SystemExit(f"{words[idx]!r}: {scalar[idx]} one word at a time, {vector[idx]} in a batch")
+
+    print(f"division: {count} words decided the same by both paths ({sum(scalar)} augmented)")
+
+
+BOOLEAN_RULES = (
+    "skip if upper_case or numeric and not punctuation",
+    "augment if (letters > 1) == (numeric > 1) and not matches(\"[.]\")",
+    "augment if upper_case and lower_case or whitespace",
+)
+
+# and/or as numbers - True in one word at a time, False in batches
+REJECTED_RULES = (
+    "augment if (upper_case or numeric) > 1",
+    "augment if (letters > 1) + (numeric > 1) > 1",
+)
+
+
+def check_boolean_rules(rng, count):
+
+    rules = Rules()
+    rules.decision_cache_size = 0
+    rules.rules = BOOLEAN_RULES
+
+    # (empty words are never augmented, see check_empty_words())
+    words = [ w for w in ( random_word(rng) for _ in range(count) ) if w ] + [ "ABc", "abc1234" ]
+
+    scalar = [ rules._decideOne(w, 0, 0) for w in words ]
+    vector = rules._decideMany(words, np.zeros(len(words), dtype=int), np.zeros(len(words), dtype=int)).tolist()
+
+    if scalar != vector:
+        idx = next( i for i, ( a, b ) in enumerate(zip(scalar, vector)) if a != b )
+        raise SystemExit(f"{words[idx]!r}: {scalar[idx]} one word at a time, {vector[idx]} in a batch")
+
+    for rule in REJECTED_RULES:
+        try:
+            rules.rules = ( rule, )
+        except RuleError:
+            continue
+        raise SystemExit(f"'{rule}' was accepted")
+
+    print(f"and/or/not: {count} words decided the same by both paths ({sum(scalar)} augmented), {len(REJECTED_RULES)} rules rejected")
+
+
+def check_empty_words():
+
+    rules = Rules()
+    rules.rules = ( "augment if punctuation == 0", )
+
+    for split_mode in ( "random", "hashed" ):
+        rules.split_mode = split_mode
+
+        # one word at a time, then as a vectorised batch
+        for words in ( [ "hello", "", "x" ], [ "hello", "", "x" ] * 10 ):
+            decided = rules.evaluate_many(words, key="p")
+
+            if decided.augment[1::3].any() or decided.head_len[1::3].any():
+                raise SystemExit(f"{split_mode}: an empty word was augmented in a batch of {len(words)}")
+
+        if rules.splitWord("") != WordDetails():
+            raise SystemExit(f"{split_mode}: splitWord('') = {rules.splitWord('')}")
+
+    print("empty words: never augmented")
+
+
+def check_hashed_keys(rng, trials):
+
+    rules = Rules()
+    rules.split_mode = "hashed"
+
+    for _ in range(trials):
+
+        # both sides of the per-word/vectorised cutover
+        words = [ random_word(rng) for _ in range(rng.choice( ( 3, 40 ) )) ]
+        keys = [ f"{rng.randint(1, 9)}:{rng.randint(1, 500)}" for _ in words ]
+
+        expected = []
+        for word, key in zip(words, keys):
+            if rules.shouldAugment(word):
+                expected.append( ( True, len( rules.splitWord(word, key=key).head ) ) )
+            else:
+                expected.append( ( False, 0 ) )
+
+        decisions = rules.evaluate_many(words, keys=keys)
+        got = list( zip( decisions.augment.tolist(), decisions.head_len.tolist() ) )
+
+        if got != expected:
+            raise SystemExit(f"evaluate_many({words!r}, keys={keys}) = {got}, expected {expected}")
+
+    print(f"hashed mode: {trials} batches split as splitWord() with the same keys")
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--words", type=int, default=100000)
+    parser.add_argument("--trials", type=int, default=300)
+    args = parser.parse_args()
+
+    logger.disable("randeli")
+
+    rng = random.Random(args.seed)
+
+    check_classifier(rng, args.words)
+    check_random_mode(rng, args.trials)
+    check_division(rng, args.trials * 10)
+    check_boolean_rules(rng, args.trials * 10)
+    check_empty_words()
+    check_hashed_keys(rng, args.trials)
+
+
+if __name__ == "__main__":
+    main()
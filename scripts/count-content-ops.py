@@ -0,0 +1,85 @@
+#! /usr/bin/env python3
+#
+# Count the text/graphics state operators in the page content streams
+# of (augmented) PDFs, without needing the Apryse SDK
+#
+#   python scripts/count-content-ops.py PDF...
+#
+# "redundant" counts state operators that are overwritten by another of
+# the same kind before anything is drawn with them
+
+import argparse
+import collections
+import re
+import zlib
+
+OPERATORS = re.compile(rb"(?<![A-Za-z*'\"])(Tf|rg|RG|g|G|cs|CS|scn|SCN|sc|SC|gs|Tj|TJ|re|f)(?![A-Za-z*])")
+
+STRINGS = re.compile(rb"\((?:\\.|[^\\)])*\)")
+
+DRAW = ( b"Tj", b"TJ", b"re", b"f" )
+
+FILL = ( b"rg", b"g", b"sc", b"scn", b"cs" )
+
+
+def content_operators(path):
+    """(decoded size, [ operator ]) over the Flate content streams with text"""
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    size = 0
+    operators = []
+
+    for m in re.finditer(rb"stream\r?\n", data):
+
+        end = data.find(b"endstream", m.end())
+
+        try:
+            content = zlib.decompressobj().decompress(data[m.end():end])
+        except zlib.error:
+            continue
+
+        if not re.search(rb"\bBT\b", content) or content.startswith(b"%!"):
+            continue
+
+        size += len(content)
+        operators += OPERATORS.findall( STRINGS.sub(b"()", content) )
+
+    return size, operators
+
+
+def redundant(operators):
+
+    count = 0
+    pending = set()
+
+    for op in operators:
+        if op in DRAW:
+            pending.clear()
+        elif op in FILL + ( b"Tf", b"gs" ):
+            kind = b"fill" if op in FILL else op
+            if kind in pending:
+                count += 1
+            pending.add(kind)
+
+    return count
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdf", nargs="+")
+    args = parser.parse_args()
+
+    for pdf in args.pdf:
+
+        size, operators = content_operators(pdf)
+        c = collections.Counter(operators)
+
+        print(f"{pdf}: {size} bytes shows={c[b'Tj'] + c[b'TJ']} Tf={c[b'Tf']}"
+              f" fill={c[b'rg'] + c[b'g'] + c[b'sc'] + c[b'scn']} gs={c[b'gs']} redundant={redundant(operators)}")
+
+
+if __name__ == "__main__":
+    main()
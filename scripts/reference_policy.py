@@ -0,0 +1,104 @@
+#
+# The per-word policy code as it was before the batch API and the
+# table-driven classifier, kept as the reference the checks and
+# benchmarks in this directory compare against
+#
+
+import random
+import string
+
+from loguru import logger
+
+from randeli.policy.rules import WordInfo
+
+# the original logged every decision, with randeli.policy.rules disabled
+logger.disable(__name__)
+
+MIN_WORDS_IN_LINE = 5
+MIN_LINES_IN_PARA = 1
+MAX_HEAD_LEN = 4
+
+
+def word_classes(txt):
+    """word_classes() with a per-character loop (quadratic in the
+    length of the word, because of the prefix isalpha())"""
+
+    winfo = WordInfo()
+
+    if not txt:
+        return winfo
+
+    winfo.txt = txt
+
+    for i in range(len(txt)):
+        if txt[:i].isalpha():
+            winfo.leading_alphabetic = i
+        if txt[i].isupper():
+            winfo.upper_case = winfo.upper_case + 1
+        elif txt[i].islower():
+            winfo.lower_case = winfo.lower_case + 1
+        elif txt[i].isspace():
+            winfo.whitespace = winfo.whitespace + 1
+        elif txt[i].isdigit():
+            winfo.numeric = winfo.numeric + 1
+        elif txt[i] in string.punctuation:
+            if ( ( i > 0 ) and txt[i-1].isdigit() ) and ( ( i < len(txt)-1 ) and txt[i+1].isdigit() ) :
+                winfo.numeric = winfo.numeric + 1
+            else:
+                winfo.punctuation = winfo.punctuation + 1
+
+    return winfo
+
+
+def decide(cls, words_in_line=0, lines_in_para=0,
+           min_words_in_line=MIN_WORDS_IN_LINE, min_lines_in_para=MIN_LINES_IN_PARA):
+    """The hard-coded shouldAugment() chain, over a classified word"""
+
+    ret = False
+
+    if cls.leading_alphabetic == 0:
+        ret = False
+    elif  cls.upper_case > 0 and cls.lower_case == 0 and cls.numeric > 0:
+        ret = False
+    else:
+        if ( cls.upper_case + cls.lower_case ) > cls.numeric:
+            ret = True
+
+        if ( cls.upper_case + cls.lower_case ) > cls.whitespace:
+            ret = True
+        else:
+            ret = False
+
+        if ( cls.upper_case + cls.lower_case ) > cls.punctuation:
+            ret = True
+        else:
+            ret = False
+
+    if words_in_line > 0 and words_in_line < min_words_in_line:
+        ret = False
+
+    if lines_in_para > 0 and lines_in_para < min_lines_in_para:
+        ret = False
+
+    return ret
+
+
+def should_augment(word, words_in_line=0, lines_in_para=0):
+    """shouldAugment(), including its debug message"""
+
+    cls = word_classes(word)
+
+    ret = decide(cls, words_in_line, lines_in_para)
+
+    logger.debug(f"Augment '{word}' ? {ret} | {cls} {words_in_line} {lines_in_para}")
+
+    return ret
+
+
+def head_length(word, max_head_len=MAX_HEAD_LEN):
+    """splitWord()'s draw from the global `random`"""
+
+    if len(word) > max_head_len:
+        return random.randint(1, max_head_len) # nosec: B311
+
+    return random.randint(1, len(word)) # nosec: B311